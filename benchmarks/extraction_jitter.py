@@ -0,0 +1,117 @@
+"""Event loop and audio thread jitter while extractions run, with thread and process workers
+
+Run from the project root: python benchmarks/extraction_jitter.py [--url URL] [--requests N]
+
+Without --url each extraction parses a synthetic player response the size of a real one, so
+the CPU cost of yt-dlp is reproduced without network access. With --url the real stream
+extraction runs against that video.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.extractor import ExtractionService, extract_stream_task, select_best_format
+
+FRAME_SECONDS = 0.02  # discord.py sends one 20 ms Opus frame per loop
+WORKERS = 4
+
+def synthetic_response(format_count=60, padding=900_000):
+    """A player response with many formats and a large blob, roughly what YouTube returns"""
+    formats = [
+        {
+            'format_id': str(i),
+            'url': f"https://example.invalid/videoplayback?id={i}&sig={'x' * 400}",
+            'acodec': random.choice(['opus', 'mp4a.40.2', 'none']),
+            'vcodec': random.choice(['none', 'avc1', 'vp9']),
+            'ext': random.choice(['webm', 'm4a', 'mp4']),
+            'abr': random.randint(48, 160),
+            'asr': 48000
+        }
+        for i in range(format_count)
+    ]
+    return json.dumps({'title': 'Synthetic', 'duration': 212, 'formats': formats, 'blob': 'y' * padding})
+
+PAYLOAD = synthetic_response()
+
+def synthetic_extraction_task(ydl_opts, query):
+    """Worker task doing the parsing part of an extraction"""
+    info = None
+    for _ in range(8):  # Signature and format handling walk the response several times
+        info = json.loads(PAYLOAD)
+    best = select_best_format(info, info['title'])
+    return {'url': best['url'], 'ext': best['ext'], 'acodec': best['acodec'], 'duration': info['duration']}
+
+def audio_thread(stop, lateness):
+    """Sleeps and does a little work every 20 ms like discord.py's AudioPlayer"""
+    frame = bytearray(3840)
+    next_frame = time.perf_counter()
+    while not stop.is_set():
+        next_frame += FRAME_SECONDS
+        frame[:] = bytes(3840)  # Stand-in for reading and sending a frame
+        delay = next_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        lateness.append(max(0.0, time.perf_counter() - next_frame))
+
+async def loop_probe(stop, lateness):
+    """Measures how late 20 ms sleeps on the event loop wake up"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(FRAME_SECONDS)
+        lateness.append(max(0.0, time.perf_counter() - started - FRAME_SECONDS))
+
+async def run_mode(use_processes, task, query, requests):
+    service = ExtractionService({'quiet': True, 'format': 'bestaudio/best'}, workers=WORKERS,
+                                max_queue=requests, use_processes=use_processes)
+    # Start the workers before measuring, a cold process pool would dominate the first requests
+    await service.submit(task, f"{query}#warmup")
+
+    stop = threading.Event()
+    audio_lateness = []
+    loop_lateness = []
+    player = threading.Thread(target=audio_thread, args=(stop, audio_lateness), daemon=True)
+    player.start()
+    probe = asyncio.create_task(loop_probe(stop, loop_lateness))
+
+    started = time.perf_counter()
+    # Distinct queries so nothing is coalesced
+    results = await asyncio.gather(*(service.submit(task, f"{query}#{i}") for i in range(requests)),
+                                   return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    player.join()
+    service.shutdown()
+    failures = sum(isinstance(result, Exception) for result in results)
+    return elapsed, failures, audio_lateness, loop_lateness
+
+def summarize(samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"p50 {statistics.median(samples) * 1000:5.1f} ms, p99 {p99 * 1000:5.1f} ms, max {samples[-1] * 1000:6.1f} ms"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="Video to extract for real instead of the synthetic task")
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    task, query = (extract_stream_task, args.url) if args.url else (synthetic_extraction_task, 'synthetic')
+    for use_processes in (False, True):
+        elapsed, failures, audio_lateness, loop_lateness = asyncio.run(run_mode(use_processes, task, query, args.requests))
+        print(f"EXTRACTION_USE_PROCESSES = {use_processes}: {args.requests} extractions in {elapsed:.2f}s"
+              + (f" ({failures} failed)" if failures else ""))
+        print(f"  audio thread frame lateness: {summarize(audio_lateness)}")
+        print(f"  event loop wake-up lateness: {summarize(loop_lateness)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Memory and shuffle cost of a large queue, compact tracks versus the old per-song dicts
+
+Run from the project root: python benchmarks/queue_memory.py [track count]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.track import Track, TrackQueue
+
+def make_records(count):
+    """Extractor-style records, a playlist repeats some titles"""
+    alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_'
+    titles = [f"Artist {i % 500} - Song title number {i}" for i in range(count // 2)]
+    return [
+        {
+            'url': f"https://www.youtube.com/watch?v={''.join(random.choices(alphabet, k=11))}",
+            'title': random.choice(titles),
+            'duration': random.randint(120, 480)
+        }
+        for _ in range(count)
+    ]
+
+def measure(build):
+    """Bytes still allocated by what build returns, and the object itself"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    records = make_records(count)
+
+    # Fresh strings, as the extractor would hand them over
+    dict_bytes, dicts = measure(lambda: [{key: (value + '.')[:-1] if isinstance(value, str) else value
+                                          for key, value in record.items()} for record in records])
+    track_bytes, queue = measure(lambda: TrackQueue(Track.from_dict(record) for record in records))
+
+    started = time.perf_counter()
+    random.shuffle(dicts)
+    dict_shuffle = time.perf_counter() - started
+
+    started = time.perf_counter()
+    queue.shuffle(keep=0)
+    track_shuffle = time.perf_counter() - started
+
+    print(f"{count} queued tracks")
+    print(f"  dict per song:  {dict_bytes / 1024 ** 2:6.1f} MB, shuffle {dict_shuffle * 1000:6.1f} ms")
+    print(f"  Track + queue:  {track_bytes / 1024 ** 2:6.1f} MB, shuffle {track_shuffle * 1000:6.1f} ms")
+
+if __name__ == '__main__':
+    main()
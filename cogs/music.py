@@ -1,13 +1,26 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-import yt_dlp
 import asyncio
 import logging
 import re
 from typing import Optional, Literal
-import random
 import os
+import time
+import threading
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from urllib.parse import urlparse, parse_qs
+from utils.search_cache import SearchCache
+from utils.track import TrackQueue, format_timestamp
+from utils.queue_view import QueueView
+from utils.audio_cache import AudioCache
+from utils.paths import get_data_path
+from utils.audio_pipeline import GaplessSource
+from utils.broadcast import Broadcast
+from utils.ffmpeg_supervisor import FFmpegSupervisor, FFmpegLimitReached, PRIORITY_PLAYBACK
+from utils.loudness import LoudnessCache, build_loudnorm_filter, measure_loudness
+from utils.extractor import ExtractionService, ExtractionError, ExtractionQueueFull, TrackUnavailable
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -31,180 +44,1054 @@ YDL_OPTS = {
 
 # Simplified FFmpeg options
 FFMPEG_OPTIONS = {
-    'options': '-vn -b:a 128k -loglevel error'
+    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
+    'options': '-vn -b:a 128k -loglevel error',
+    'passthrough_options': '-vn -loglevel error'  # Opus packets are copied, not re-encoded
 }
+FFMPEG_EXECUTABLE = 'ffmpeg'
+LOUDNESS_MEASUREMENT_LIMIT = 2  # Background loudness analysis passes allowed at once
+
+# FFmpeg process supervision settings
+FFMPEG_MAX_PROCESSES = 64  # Hard ceiling on FFmpeg children across all guilds
+FFMPEG_NICENESS = None  # Niceness for playback processes (None = unchanged)
+FFMPEG_BACKGROUND_NICENESS = 10  # Niceness for loudness analysis and cache downloads
+FFMPEG_REAP_INTERVAL = 30  # Seconds between sweeps for exited and orphaned processes
+
+# Track transition settings
+PRESPAWN_SECONDS = 10  # Start the next track's FFmpeg this long before the current one ends
+MAX_CROSSFADE_SECONDS = 12
+
+# Mid-stream recovery settings
+STREAM_RECOVERY_ATTEMPTS = 3  # Times a track's stream is re-resolved after dying early
+PREMATURE_EOF_TOLERANCE = 5  # Seconds before the expected end that still count as finished
+STOP_TIMEOUT = 2  # Seconds to wait for the player thread after stopping a track
+PLAYBACK_RETRY_LIMIT = 5  # Failed extractions in a row before playback gives up
+VALIDATE_AHEAD = 5  # Upcoming tracks checked in the background for deleted/private videos
+VALIDATE_LIMIT = 2  # Background checks resolving at once across all guilds, leaving workers for commands
+UNAVAILABLE_TTL = 3600  # Seconds a track that failed extraction is skipped without retrying
+UNAVAILABLE_CACHE_SIZE = 5000
+
+# Broadcast settings
+BROADCAST_BUFFER_FRAMES = 50  # Per-listener buffer (20 ms frames) before old packets are dropped
+
+# On-disk audio cache settings
+AUDIO_CACHE_ENABLED = False  # Keep played tracks under data/audio_cache (data/audio_cache/cluster-N per cluster)
+AUDIO_CACHE_MAX_BYTES = 2 * 1024 ** 3  # Size cap for cached audio, applies to each cluster
+AUDIO_CACHE_MAX_DURATION = 900  # Longer tracks are always streamed
+
+# Extraction pool settings
+EXTRACTION_WORKERS = 4        # Threads running yt-dlp, each with its own YoutubeDL
+EXTRACTION_QUEUE_LIMIT = 32   # Extractions allowed to wait for a free worker
+EXTRACTION_USE_PROCESSES = False  # Run yt-dlp in worker processes instead of threads
+
+# Playlist ingestion settings
+PLAYLIST_FIRST_BATCH = 100  # Entries queued before playback starts (one YouTube page)
+PLAYLIST_MAX_BATCH = 800    # Largest batch of entries queued at once while the rest of the walk loads
+
+# Resolved stream URL cache settings
+STREAM_CACHE_SIZE = 512        # Maximum number of cached stream URLs
+STREAM_CACHE_DEFAULT_TTL = 1800  # Seconds to keep URLs that carry no expire parameter
+STREAM_CACHE_EXPIRY_MARGIN = 300  # Drop URLs this many seconds before they expire
+
+TIMESTAMP_PATTERN = re.compile(r'^(?:(\d+):)?(?:(\d+):)?(\d+(?:\.\d+)?)$')
+JUMP_CHOICE_PATTERN = re.compile(r'#(\d+):([\w-]*)')  # Value of a /jump autocomplete choice, position and video ID
+JUMP_CHOICES = 25  # Discord's limit on autocomplete suggestions
+
+def parse_timestamp(value):
+    """Parse '1:23:45', '3:05' or '185' into seconds, None if invalid"""
+    match = TIMESTAMP_PATTERN.match(value.strip())
+    if not match:
+        return None
+    parts = [part for part in match.groups() if part is not None]
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+class StreamCache:
+    """LRU cache of resolved streams keyed by video ID, shared across guilds"""
+
+    def __init__(self, max_size=STREAM_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # Video ID -> (stream record, expires at)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_expiry(stream_url):
+        """Read the expiry timestamp from a signed googlevideo URL"""
+        try:
+            query = parse_qs(urlparse(stream_url).query)
+            if 'expire' in query:
+                return int(query['expire'][0]) - STREAM_CACHE_EXPIRY_MARGIN
+        except (ValueError, IndexError):
+            pass
+        return time.time() + STREAM_CACHE_DEFAULT_TTL
+
+    def get(self, video_id):
+        """Return a cached stream record if its URL is still valid"""
+        if not video_id:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(video_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stream, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[video_id]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(video_id)
+            self.hits += 1
+            return stream
+
+    def put(self, video_id, stream):
+        """Store a resolved stream record, evicting the least recently used entries"""
+        if not video_id:
+            return
+
+        with self.lock:
+            self.entries[video_id] = (stream, self.get_expiry(stream['url']))
+            self.entries.move_to_end(video_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        """Get hit/miss counters"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries)
+        }
+
+    def discard(self, video_id):
+        """Forget a stream URL that turned out to be unusable"""
+        with self.lock:
+            self.entries.pop(video_id, None)
+
+# Shared by every guild so replays and loops skip extraction
+stream_cache = StreamCache()
 
 class Music(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.ydl = yt_dlp.YoutubeDL(YDL_OPTS)
-        self.active_players = {}
-        self.current_position = {}  # Track current position in queue per guild
-        self.stopped_position = {}  # Track where playback was stopped
-        self.skip_next_progression = {}  # New flag to control auto-progression
-        self.original_channels = {}  # Track original command channels per guild
-        self.auto_clear = {}  # Track auto-clear setting per guild
-        self.current_song = None  # Track current song after queue clear
-
-    async def cleanup(self, guild_id):
-        """Cleanup resources for a guild"""
-        if guild_id in self.active_players:
+        self.extractor = ExtractionService(
+            YDL_OPTS,
+            workers=EXTRACTION_WORKERS,
+            max_queue=EXTRACTION_QUEUE_LIMIT,
+            use_processes=EXTRACTION_USE_PROCESSES
+        )
+        self.supervisor = FFmpegSupervisor(
+            max_processes=FFMPEG_MAX_PROCESSES,
+            niceness=FFMPEG_NICENESS,
+            background_niceness=FFMPEG_BACKGROUND_NICENESS
+        )
+        self.reaper_task = None
+        # Each cluster saves its caches whole, so clusters get their own files instead of overwriting each other's
+        cluster = self.bot.cluster
+        suffix = f'-cluster-{cluster.cluster_id}' if cluster else ''
+        self.search_cache = SearchCache(get_data_path(f'search_cache{suffix}.json'))  # Normalized search query -> Track, persisted in data/
+        self.loudness_cache = LoudnessCache(get_data_path(f'loudness{suffix}.json'))  # Video ID -> Loudness measurement, persisted in data/
+        self.loudness_tasks = {}  # Video ID -> Running loudness measurement
+        self.loudness_slots = asyncio.Semaphore(LOUDNESS_MEASUREMENT_LIMIT)
+        self.validate_slots = asyncio.Semaphore(VALIDATE_LIMIT)
+        self.broadcasts = {}  # Station name -> {'broadcast', 'tracks', 'index', 'host', 'now_playing'}
+        self.transition_gaps = deque(maxlen=200)  # Recent silences between tracks in seconds
+        self.unavailable = OrderedDict()  # Video ID or URL -> When extraction failed, shared by all guilds
+        self.audio_cache = None  # Video ID -> Local Opus/webm file, if enabled
+        if AUDIO_CACHE_ENABLED:
+            # Each cluster keeps its own index and size cap, so clusters get their own directory
+            self.audio_cache = AudioCache(
+                path=get_data_path('audio_cache', f'cluster-{cluster.cluster_id}') if cluster else None,
+                max_bytes=AUDIO_CACHE_MAX_BYTES,
+                max_duration=AUDIO_CACHE_MAX_DURATION,
+                executable=FFMPEG_EXECUTABLE,
+                supervisor=self.supervisor
+            )
+
+    async def cog_load(self):
+        self.reaper_task = asyncio.create_task(self.reap_processes())
+
+    async def cog_unload(self):
+        if self.reaper_task:
+            self.reaper_task.cancel()
+        self.extractor.shutdown()
+        for task in self.loudness_tasks.values():
+            task.cancel()
+        self.search_cache.save()
+        self.loudness_cache.save()
+        if self.audio_cache:
+            self.audio_cache.shutdown()
+        for station in self.broadcasts.values():
+            station['broadcast'].stop()
+        self.supervisor.shutdown()
+        logger.info(f"Search cache stats: {self.search_cache.stats()}")
+        logger.info(f"Extraction stats: {self.extractor.stats()}")
+
+    async def cleanup(self, guild_id, forget=False):
+        """Cleanup resources for a guild, keeping its saved queue unless forget is set"""
+        player = self.bot.players.get(guild_id)
+        if player:
+            self.invalidate_prefetch(player)
+            self.cancel_playlist_loading(player)
+            if player.validate_task:
+                player.validate_task.cancel()
+            self.bot.remove_player(guild_id)
+        if forget:
+            self.bot.store.delete(guild_id)
+        elif player:
+            self.bot.store.save(player)
+        self.supervisor.kill_guild(guild_id)
+
+    async def reap_processes(self):
+        """Periodically forget exited FFmpeg processes and kill ones left by dropped voice connections"""
+        while True:
+            await asyncio.sleep(FFMPEG_REAP_INTERVAL)
             try:
-                process = self.active_players[guild_id]
-                process.kill()
-            except:
-                pass
-            del self.active_players[guild_id]
+                self.supervisor.reap()
+                for guild_id in self.supervisor.guild_ids():
+                    guild = self.bot.get_guild(guild_id)
+                    if not guild or not guild.voice_client:
+                        logger.info(f"Killing orphaned FFmpeg processes for guild {guild_id}")
+                        self.supervisor.kill_guild(guild_id)
+            except Exception as e:
+                logger.error(f"Error reaping FFmpeg processes: {e}")
 
-    async def play_next(self, guild, force_position=None, interaction=None, command_channel=None):
-        # Check if we have either a queue or a current_song
-        if not guild.id in self.bot.music_queues and not self.current_song:
-            return
+    async def interaction_check(self, interaction: discord.Interaction):
+        # Load a guild's saved queue before its first command after a restart
+        if interaction.guild:
+            await self.bot.restore_player(interaction.guild.id)
+        return True
 
-        voice_client = guild.voice_client
-        if not voice_client:
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member, before, after):
+        # Clean up when the bot is dropped from voice
+        if member.id == self.bot.user.id and before.channel and not after.channel:
+            await self.cleanup(member.guild.id)
+
+    @staticmethod
+    def is_playlist_query(query):
+        """Check if a query is a playlist URL"""
+        is_url = re.match(r'https?://(?:www\.)?.+', query) is not None
+        return is_url and ('playlist' in query or 'list=' in query)
+
+    async def ingest_playlist(self, interaction, query, start_playing=False):
+        """Queue the first page of a playlist right away and load the rest in the background"""
+        guild = interaction.guild
+        player = self.bot.get_player(guild.id)
+        queue = player.queue
+
+        # Keep playlists in order if another one is still loading
+        previous = player.playlist_task
+        if previous and not previous.done():
+            message = await interaction.followup.send("Adding playlist after the one currently loading...", wait=True)
+            player.playlist_task = asyncio.create_task(
+                self.load_playlist_rest(guild, query, None, queue, message, "playlist", 0, previous, interaction.user.id)
+            )
             return
 
+        # One walk over the playlist feeds both the first batch and the background loading
+        stream = self.extractor.stream_playlist(query, PLAYLIST_FIRST_BATCH, PLAYLIST_MAX_BATCH)
         try:
-            # Wait for any current playback to fully stop
-            if voice_client.is_playing():
-                voice_client.stop()
-                await asyncio.sleep(0.5)
-
-            # If we have a current_song from queue clear
-            if self.current_song:
-                track = self.current_song
-                # Don't add to queue, just play it
-            else:
-                # Use forced position if provided, otherwise use current position
-                position = force_position if force_position is not None else self.current_position.get(guild.id, 0)
-                
-                # Ensure position is valid
-                if position >= len(self.bot.music_queues[guild.id]):
-                    position = 0
-                
-                self.current_position[guild.id] = position
-                track = self.bot.music_queues[guild.id][position]
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = None
+        if not first or not first['tracks']:
+            await stream.aclose()
+            playlist_title = first['playlist_title'] if first else "playlist"
+            return await interaction.followup.send(f"No playable tracks found in playlist: {playlist_title}")
 
-            self.bot.now_playing[guild.id] = track
+        playlist_title = first['playlist_title']
+        message = await interaction.followup.send(f"Adding playlist: {playlist_title}", wait=True)
 
-            try:
-                # Get fresh track info
-                info = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: self.ydl.extract_info(track['url'], download=False)
+        queue.extend(first['tracks'], added_by=interaction.user.id)
+        self.refresh_prefetch(guild)
+
+        if start_playing:
+            await self.play_if_idle(guild, command_channel=interaction.channel)
+
+        player.playlist_task = asyncio.create_task(
+            self.load_playlist_rest(
+                guild, query, stream, queue, message, playlist_title, len(first['tracks']), added_by=interaction.user.id
+            )
+        )
+
+    async def load_playlist_rest(self, guild, query, stream, queue, message, playlist_title, added, previous=None, added_by=None):
+        """Append the remaining batches of a playlist walk, starting one if stream is None"""
+        try:
+            if previous:
+                try:
+                    await previous
+                except Exception:
+                    pass
+
+            if stream is None:
+                stream = self.extractor.stream_playlist(query, PLAYLIST_FIRST_BATCH, PLAYLIST_MAX_BATCH)
+
+            async for batch in stream:
+                playlist_title = batch['playlist_title']
+
+                # Stop if the queue was cleared or replaced while loading
+                player = self.bot.players.get(guild.id)
+                if not player or player.queue is not queue:
+                    await self.update_playlist_message(message, f"Stopped loading {playlist_title} ({added} tracks added)")
+                    return
+
+                queue.extend(batch['tracks'], added_by=added_by)
+                added += len(batch['tracks'])
+                self.refresh_prefetch(guild)
+                await self.update_playlist_message(message, f"Adding playlist: {playlist_title} ({added} tracks loaded so far...)")
+
+            await self.update_playlist_message(message, f"Added {added} tracks to queue from {playlist_title}")
+        except asyncio.CancelledError:
+            await self.update_playlist_message(message, f"Stopped loading {playlist_title} ({added} tracks added)")
+            raise
+        except Exception as e:
+            logger.error(f"Error loading playlist {query}: {e}")
+            await self.update_playlist_message(message, f"Added {added} tracks from {playlist_title}, the rest could not be loaded")
+        finally:
+            if stream is not None:
+                await stream.aclose()  # Stops the walk if we left early
+            player = self.bot.players.get(guild.id)
+            if player and player.playlist_task is asyncio.current_task():
+                player.playlist_task = None
+
+    @staticmethod
+    async def update_playlist_message(message, content):
+        """Edit the playlist progress message"""
+        try:
+            await message.edit(content=content)
+        except Exception as e:
+            logger.debug(f"Could not update playlist message: {e}")
+
+    def cancel_playlist_loading(self, player):
+        """Stop any background playlist loading for a guild"""
+        task, player.playlist_task = player.playlist_task, None
+        if task and not task.done():
+            task.cancel()
+
+    async def fetch_tracks(self, query):
+        """Resolve a URL or search query to tracks, returns (tracks, playlist title)"""
+        # Check if the query is a URL
+        is_url = re.match(r'https?://(?:www\.)?.+', query) is not None
+        if not is_url:
+            cached_track = self.search_cache.get(query)
+            logger.debug(f"Search cache stats: {self.search_cache.stats()}")
+            if cached_track:
+                return [cached_track], None
+            search_query = f"ytsearch:{query}"
+        else:
+            search_query = query
+
+        # Get track info
+        result = await self.extractor.extract_tracks(search_query)
+        tracks_to_add = result['tracks']
+        playlist_title = result['playlist_title']
+
+        if not is_url:
+            self.search_cache.put(query, tracks_to_add[0])
+            await asyncio.get_event_loop().run_in_executor(None, self.search_cache.save)
+
+        return tracks_to_add, playlist_title
+
+    async def resolve_stream(self, track):
+        """Resolve a queued track to a playable stream record"""
+        video_id = track.video_id
+        stream = stream_cache.get(video_id)
+        if stream:
+            return stream
+
+        stream = await self.extractor.extract_stream(track.url)
+        stream_cache.put(video_id, stream)
+        return stream
+
+    async def get_cached_audio(self, track):
+        """Return a local stream record if the track is in the on-disk audio cache"""
+        if not self.audio_cache:
+            return None
+
+        path = await self.audio_cache.get(track.video_id)
+        if not path:
+            return None
+
+        return {'url': path, 'ext': 'webm', 'acodec': 'opus', 'local': True, 'duration': track.duration}
+
+    @staticmethod
+    def is_opus_stream(stream):
+        """Check if a stream can be sent to Discord without re-encoding"""
+        return stream.get('acodec') == 'opus' and stream.get('ext') == 'webm'
+
+    def build_audio_filters(self, player, track):
+        """Build the FFmpeg filter chain for volume and loudness normalization"""
+        filters = []
+
+        if player.normalize:
+            measurement = self.loudness_cache.get(track.video_id)
+            filters.append(build_loudnorm_filter(measurement))
+
+        if player.volume != 100:
+            filters.append(f"volume={player.volume / 100:.2f}")
+
+        return ','.join(filters)
+
+    def create_audio_source(self, guild, track, stream, force_pcm=False, start_at=0, opus=None):
+        """Create the audio source for a stream, skipping decode/re-encode when possible
+
+        opus forces the output type, so sources handed to a running GaplessSource match the one it started with.
+        """
+        self.supervisor.ensure_capacity(PRIORITY_PLAYBACK)
+        filters = self.build_audio_filters(self.bot.get_player(guild.id), track)
+        # Reconnect options only apply to remote streams
+        before_options = None if stream.get('local') else FFMPEG_OPTIONS['before_options']
+        if start_at:
+            # Input seeking jumps straight to the timestamp without decoding what came before
+            before_options = f"-ss {start_at:.2f} {before_options or ''}".strip()
+
+        passthrough = not filters and self.is_opus_stream(stream)
+        if opus is None:
+            opus = passthrough and not force_pcm
+
+        if opus:
+            # Opus that needs no filtering is copied straight through, anything else is encoded by FFmpeg
+            options = FFMPEG_OPTIONS['passthrough_options'] if passthrough else FFMPEG_OPTIONS['options']
+            if filters:
+                options = f'{options} -af "{filters}"'
+            source = discord.FFmpegOpusAudio(
+                stream['url'],
+                codec='opus' if passthrough else None,  # 'opus' means copy in every discord.py version
+                executable=FFMPEG_EXECUTABLE,
+                before_options=before_options,
+                options=options
+            )
+        else:
+            # Volume and loudness are applied by FFmpeg, not per frame in Python
+            options = FFMPEG_OPTIONS['options']
+            if filters:
+                options = f'{options} -af "{filters}"'
+
+            source = discord.FFmpegPCMAudio(
+                stream['url'],
+                executable=FFMPEG_EXECUTABLE,
+                before_options=before_options,
+                options=options
+            )
+
+        self.supervisor.register(source._process, guild.id)
+        return source
+
+    def schedule_loudness_measurement(self, player, track, stream):
+        """Measure a track's loudness in the background so replays can use linear normalization"""
+        if not player.normalize:
+            return
+
+        video_id = track.video_id
+        if not video_id or video_id in self.loudness_tasks or self.loudness_cache.get(video_id):
+            return
+
+        self.loudness_tasks[video_id] = asyncio.create_task(self.measure_track_loudness(video_id, track, stream))
+
+    async def measure_track_loudness(self, video_id, track, stream):
+        """Run a loudness analysis pass and cache the result"""
+        try:
+            async with self.loudness_slots:
+                measurement = await measure_loudness(
+                    stream['url'],
+                    executable=FFMPEG_EXECUTABLE,
+                    supervisor=self.supervisor
                 )
-                
-                if not info:
-                    logger.error(f"Failed to get track info: Info is None")
-                    raise Exception("Track unavailable")
+            self.loudness_cache.put(video_id, measurement)
+            await asyncio.get_event_loop().run_in_executor(None, self.loudness_cache.save)
+            logger.debug(f"Measured loudness for {track.title}: {measurement['input_i']} LUFS")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Loudness measurement failed for {track.title}: {e}")
+        finally:
+            self.loudness_tasks.pop(video_id, None)
 
-                # Get the best audio format URL
-                formats = info.get('formats', [])
-                if not formats:
-                    logger.error(f"No formats available for track: {track['title']}")
-                    raise Exception("No audio formats available")
+    def peek_next_position(self, player):
+        """Work out which queue position song_finished will play next, without changing state"""
+        queue = player.queue
+        if not queue or player.current_song:
+            return None
 
-                audio_formats = [f for f in formats if f.get('acodec') != 'none' and f.get('vcodec') == 'none']
-                
-                if not audio_formats:
-                    audio_formats = formats
-                    logger.warning(f"No audio-only formats found for {track['title']}, using mixed formats")
-                
-                best_format = sorted(
-                    audio_formats,
-                    key=lambda x: (x.get('abr', 0) or 0, x.get('asr', 0) or 0),
-                    reverse=True
-                )[0]
-                
-                url = best_format.get('url')
-                if not url:
-                    logger.error(f"No URL found in best format for track: {track['title']}")
-                    raise Exception("No playable URL found")
+        # A queued position from /queue position takes priority
+        if player.next_position:
+            next_pos = player.next_position['position']
+            return next_pos if next_pos < len(queue) else None
 
-            except Exception as e:
-                logger.error(f"Error fetching track info: {str(e)}")
-                logger.error(f"Track details: {track}")
-                # Skip this track and try the next one
-                logger.info(f"Skipping unavailable track: {track['title']}")
-                next_pos = position + 1
-                if next_pos < len(self.bot.music_queues[guild.id]):
-                    self.current_position[guild.id] = next_pos
-                    await self.play_next(guild, command_channel=command_channel)
+        current_pos = player.position
+
+        # Loop modes replay the current song
+        if player.loop_mode in ('on', 'single'):
+            return current_pos if current_pos < len(queue) else None
+
+        next_pos = current_pos + 1
+        if next_pos >= len(queue):
+            if player.repeat_mode in ('all', 'single'):
+                return 0
+            return None
+
+        return next_pos
+
+    def schedule_prefetch(self, player):
+        """Start resolving the stream URL of the upcoming track in the background"""
+        self.invalidate_prefetch(player)
+
+        position = self.peek_next_position(player)
+        if position is None:
+            return
+
+        track = player.queue[position]
+        # Tracks already on disk need no stream URL
+        if self.audio_cache and track.video_id in self.audio_cache.entries:
+            return
+        if self.is_unavailable(track):
+            return
+
+        player.prefetch_task = asyncio.create_task(self.prefetch_track(player, position, track))
+
+    async def prefetch_track(self, player, position, track):
+        """Resolve and store the stream for an upcoming track"""
+        try:
+            stream = await self.resolve_stream(track)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # start_playback will retry and handle the failure when the track is reached
+            logger.debug(f"Prefetch failed for {track.title}: {e}")
+            return
+        finally:
+            if player.prefetch_task is asyncio.current_task():
+                player.prefetch_task = None
+
+        player.prefetched = {
+            'position': position,
+            'track_url': track.url,
+            'stream': stream
+        }
+
+    def is_unavailable(self, track):
+        """Check if a track recently failed extraction"""
+        key = track.video_id or track.url
+        failed_at = self.unavailable.get(key)
+        if failed_at is None:
+            return False
+        if time.time() - failed_at >= UNAVAILABLE_TTL:
+            del self.unavailable[key]
+            return False
+        return True
+
+    def mark_unavailable(self, track):
+        """Remember that a track could not be extracted so every guild skips it"""
+        key = track.video_id or track.url
+        self.unavailable[key] = time.time()
+        self.unavailable.move_to_end(key)
+        while len(self.unavailable) > UNAVAILABLE_CACHE_SIZE:
+            self.unavailable.popitem(last=False)
+
+    def schedule_validation(self, player):
+        """Check the next few queued tracks in the background"""
+        task = player.validate_task
+        if not task or task.done():
+            player.validate_task = asyncio.create_task(self.validate_upcoming(player))
+
+    async def validate_upcoming(self, player):
+        """Resolve upcoming tracks concurrently so dead ones are marked before they are reached"""
+        try:
+            queue = player.queue
+            start = player.position + 1
+            tracks = [
+                queue[position] for position in range(start, min(start + VALIDATE_AHEAD, len(queue)))
+                if not self.is_unavailable(queue[position])
+                and not (self.audio_cache and queue[position].video_id in self.audio_cache.entries)
+            ]
+            if not tracks:
                 return
 
-            # Create audio source
+            # Resolved streams land in the stream cache, so valid tracks also start faster
+            results = await asyncio.gather(*(self.validate_track(track) for track in tracks), return_exceptions=True)
+            for track, result in zip(tracks, results):
+                if isinstance(result, TrackUnavailable):
+                    logger.info(f"Marked unavailable ahead of time: {track.title}")
+                    self.mark_unavailable(track)
+        finally:
+            if player.validate_task is asyncio.current_task():
+                player.validate_task = None
+
+    async def validate_track(self, track):
+        """Resolve an upcoming track without taking more than VALIDATE_LIMIT extraction workers"""
+        async with self.validate_slots:
+            return await self.resolve_stream(track)
+
+    def take_prefetched(self, player, track):
+        """Return the prefetched stream if it belongs to this track"""
+        entry, player.prefetched = player.prefetched, None
+        if entry and entry['track_url'] == track.url:
+            return entry['stream']
+        return None
+
+    def invalidate_prefetch(self, player):
+        """Discard any prefetched stream after the queue or position changes"""
+        player.prefetched = None
+        task, player.prefetch_task = player.prefetch_task, None
+        if task and not task.done():
+            task.cancel()
+        self.discard_prespawned(player)
+
+    def discard_prespawned(self, player):
+        """Drop the pre-spawned next source unless it is still the track that plays next"""
+        source = player.gapless_source
+        task, player.prespawn_task = player.prespawn_task, None
+        if task and not task.done():
+            task.cancel()
+            if source:
+                source.clear_next()  # Lets the audio thread ask for the next track again
+            return
+
+        if not source or not source.next_meta:
+            return
+
+        meta = source.next_meta
+        position = self.peek_next_position(player)
+        if position != meta['position'] or position is None or player.queue[position] is not meta['track']:
+            source.clear_next()
+
+    def request_prespawn(self, guild):
+        """Called from the audio thread when the current track is about to end"""
+        def start():
+            player = self.bot.players.get(guild.id)
+            if not player:
+                return
+            task = player.prespawn_task
+            if not task or task.done():
+                player.prespawn_task = asyncio.create_task(self.prespawn_next(guild, player))
+
+        self.bot.loop.call_soon_threadsafe(start)
+
+    async def prespawn_next(self, guild, player):
+        """Spawn and buffer the next track's FFmpeg so the swap has no gap"""
+        source = player.gapless_source
+        position = self.peek_next_position(player)
+        if not source or position is None or source.next_meta:
+            return
+        # Crossfade mixes PCM, so an Opus player lets song_finished start a new PCM one instead
+        if source.is_opus() and player.crossfade > 0:
+            return
+
+        track = player.queue[position]
+        # song_finished skips it right away
+        if self.is_unavailable(track):
+            return
+        try:
+            stream = await self.get_cached_audio(track) or self.take_prefetched(player, track)
+            if not stream:
+                stream = await self.resolve_stream(track)
+            next_source = self.create_audio_source(guild, track, stream, opus=source.is_opus())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # song_finished will play it the normal way and handle the failure
+            logger.debug(f"Could not pre-spawn {track.title}: {e}")
+            return
+
+        # The queue may have changed while we were resolving
+        queue = player.queue
+        if (player.gapless_source is not source or self.peek_next_position(player) != position
+                or position >= len(queue) or queue[position] is not track):
+            next_source.cleanup()
+            return
+
+        source.set_next(next_source, {
+            'position': position,
+            'track': track,
+            'stream': stream,
+            'duration': stream.get('duration') or track.duration
+        })
+
+    async def track_transitioned(self, guild, source, meta):
+        """Commit queue state after the audio thread swapped to the pre-spawned track"""
+        player = self.bot.players.get(guild.id)
+        if not player:
+            return
+
+        async with player.lock:
+            # A command that stopped or replaced the source already decided what plays now
+            if player.gapless_source is not source:
+                logger.debug(f"Ignoring transition of a detached source in guild {guild.id}")
+                return
+
+            result = self.advance_position(player)
+            if result is None or result[0] != meta['position']:
+                logger.warning(f"Queue changed during track transition, expected position {meta['position']}, got {result}")
+            channel = result[1] if result else None
+
+            track = meta['track']
+            player.position = meta['position']
+            player.now_playing = track
+            player.current_stream = meta['stream']
+
+            safe_title = track.title.encode('ascii', 'ignore').decode('ascii')
+            logger.info(f"Started playing: {safe_title}")
+
+            self.on_track_started(player, track, meta['stream'])
+
+        if channel:
+            await self.send_playing_message(guild, track, command_channel=channel)
+
+    def on_track_started(self, player, track, stream):
+        """Kick off background work for the track that just started"""
+        player.recovery_attempts = None
+        self.bot.store.save(player)
+        # Resolve the following track while this one plays
+        self.schedule_prefetch(player)
+        self.schedule_validation(player)
+        self.schedule_loudness_measurement(player, track, stream)
+        if self.audio_cache and not stream.get('local'):
+            self.audio_cache.schedule_download(track.video_id, stream, track.duration)
+
+    @staticmethod
+    def get_playback_position(player):
+        """Seconds into the current track, based on frames sent to Discord"""
+        source = player.gapless_source
+        return source.position if source else None
+
+    async def get_current_stream(self, player, track):
+        """Get the playing track's stream, re-resolving only if its URL expired"""
+        stream = player.current_stream
+        if stream and (stream.get('local') or StreamCache.get_expiry(stream['url']) > time.time()):
+            return stream
+        return await self.get_cached_audio(track) or await self.resolve_stream(track)
+
+    async def restart_current_track(self, guild, start_at=None, stream=None):
+        """Rebuild the current track's FFmpeg source at a timestamp without interrupting the player"""
+        player = self.bot.get_player(guild.id)
+        source = player.gapless_source
+        track = player.now_playing
+        if not source or not track:
+            return False
+
+        if start_at is None:
+            start_at = source.position
+
+        if stream is None:
+            stream = await self.get_current_stream(player, track)
+        # Filters can change here, but the running player can't switch between Opus and PCM
+        new_source = self.create_audio_source(guild, track, stream, start_at=start_at, opus=source.is_opus())
+
+        # The track may have changed while we were resolving
+        if player.gapless_source is not source or player.now_playing is not track:
+            new_source.cleanup()
+            return False
+
+        player.current_stream = stream
+        source.replace_current(new_source, start_offset=start_at)
+        return True
+
+    def get_broadcast_source(self, name):
+        """Called from a broadcast thread to get the station's next Opus source"""
+        future = asyncio.run_coroutine_threadsafe(self.next_broadcast_source(name), self.bot.loop)
+        try:
+            return future.result(timeout=60)
+        except Exception as e:
+            logger.error(f"Error loading next track for broadcast {name}: {e}")
+            return None
+
+    async def next_broadcast_source(self, name):
+        """Resolve the next track of a station into one shared Opus encoder"""
+        station = self.broadcasts.get(name)
+        if not station:
+            return None
+
+        # Stations repeat their track list, skipping anything unavailable
+        for _ in range(len(station['tracks'])):
+            track = station['tracks'][station['index'] % len(station['tracks'])]
+            station['index'] += 1
             try:
-                audio_source = discord.FFmpegPCMAudio(
-                    url,
-                    before_options='-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
-                    options=FFMPEG_OPTIONS['options']
+                stream = await self.get_cached_audio(track) or await self.resolve_stream(track)
+                self.supervisor.ensure_capacity(PRIORITY_PLAYBACK)
+                before_options = None if stream.get('local') else FFMPEG_OPTIONS['before_options']
+                # Opus is copied as is, anything else is encoded once here for every listener
+                source = discord.FFmpegOpusAudio(
+                    stream['url'],
+                    codec='opus' if self.is_opus_stream(stream) else None,
+                    executable=FFMPEG_EXECUTABLE,
+                    before_options=before_options,
+                    options=FFMPEG_OPTIONS['passthrough_options']
                 )
             except Exception as e:
-                logger.error(f"Error creating FFmpeg audio source: {str(e)}")
-                logger.error(f"URL: {url}")
-                raise
+                logger.error(f"Skipping {track.title} on broadcast {name}: {e}")
+                continue
+
+            self.supervisor.register(source._process, kind='broadcast')
+            station['now_playing'] = track
+            return source
+
+        return None
+
+    def request_stream_recovery(self, guild, position):
+        """Called from the audio thread when a stream ended early, returns True if a retry was started"""
+        player = self.bot.players.get(guild.id)
+        if not player:
+            return False
+
+        track = player.now_playing
+        stream = player.current_stream
+        if not track or not stream or stream.get('local'):
+            return False
+
+        track_url, attempts = player.recovery_attempts or (None, 0)
+        if track_url != track.url:
+            attempts = 0
+        if attempts >= STREAM_RECOVERY_ATTEMPTS:
+            logger.warning(f"Giving up on {track.title} after {attempts} stream recoveries")
+            return False
+
+        player.recovery_attempts = (track.url, attempts + 1)
+        asyncio.run_coroutine_threadsafe(self.recover_stream(guild, player, track, position), self.bot.loop)
+        return True
+
+    async def recover_stream(self, guild, player, track, position):
+        """Re-resolve an expired or dropped stream and continue from where it stopped"""
+        source = player.gapless_source
+        safe_title = track.title.encode('ascii', 'ignore').decode('ascii')
+        logger.info(f"Stream for {safe_title} ended early at {format_timestamp(position)}, reconnecting")
+        try:
+            # The cached URL is what just failed, so get a fresh one
+            stream_cache.discard(track.video_id)
+            stream = await self.resolve_stream(track)
+            if not await self.restart_current_track(guild, start_at=position, stream=stream):
+                raise Exception("Track changed during recovery")
+        except Exception as e:
+            logger.error(f"Stream recovery failed for {safe_title}: {e}")
+            if source:
+                source.abort_recovery()
+
+    @staticmethod
+    def take_resume_point(player, track):
+        """Return where a stopped track should resume, if it is the one that was stopped"""
+        stopped, player.stopped_at = player.stopped_at, None
+        if stopped and stopped[0] == track.url:
+            return stopped[1]
+        return 0
+
+    def record_gap(self, gap):
+        """Store the silence between two tracks"""
+        self.transition_gaps.append(gap)
+        logger.debug(f"Track transition gap: {gap * 1000:.0f} ms")
+
+    def refresh_prefetch(self, guild):
+        """Re-resolve the upcoming track and save state after the queue or playback modes change"""
+        player = self.bot.get_player(guild.id)
+        self.bot.store.save(player)
+        if guild.voice_client and guild.voice_client.is_playing():
+            self.schedule_prefetch(player)
+        else:
+            self.invalidate_prefetch(player)
+
+    async def stop_playback(self, guild, player):
+        """Stop the current source on purpose and wait for the player thread to let go of it"""
+        # A detached source's after callback no longer advances the queue
+        player.gapless_source = None
+        voice_client = guild.voice_client
+        if not voice_client or not (voice_client.is_playing() or voice_client.is_paused()):
+            return
+
+        done = player.playback_done
+        voice_client.stop()
+        if done:
+            try:
+                await asyncio.wait_for(done.wait(), timeout=STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"Player for guild {guild.id} did not stop within {STOP_TIMEOUT}s")
+
+    async def play_if_idle(self, guild, command_channel=None):
+        """Start the queue unless something is already playing"""
+        player = self.bot.get_player(guild.id)
+        async with player.lock:
+            # Checked under the lock so quick /play commands don't start two tracks
+            if guild.voice_client and not guild.voice_client.is_playing():
+                await self.start_playback(guild, command_channel=command_channel)
+
+    async def start_playback(self, guild, force_position=None, interaction=None, command_channel=None, start_at=None):
+        """Play a track from the queue, the caller must hold the player's lock"""
+        player = self.bot.players.get(guild.id)
+        # Check if we have either a queue or a current_song
+        if not player or (not player.queue and not player.current_song):
+            return
+
+        voice_client = guild.voice_client
+        if not voice_client:
+            return
+
+        # Wait for any current playback to fully stop
+        await self.stop_playback(guild, player)
+
+        message_channel = interaction.channel if interaction else command_channel or player.original_channel
+        position = force_position if force_position is not None else player.position
+        # Ensure position is valid
+        if position >= len(player.queue):
+            position = 0
 
-            transformed_source = discord.PCMVolumeTransformer(
+        # Walk forward over unavailable tracks until one plays, within a retry budget
+        failures = 0
+        skipped = 0
+        while True:
+            # If we have a current_song from queue clear, play it without touching the queue
+            if player.current_song:
+                track = player.current_song
+            else:
+                player.position = position
+                track = player.queue[position]
+            player.now_playing = track
+
+            if not self.is_unavailable(track):
+                try:
+                    stream, audio_source = await self.open_track(guild, player, track, start_at)
+                    break
+                except (FFmpegLimitReached, ExtractionQueueFull) as e:
+                    # The bot is out of capacity, not the track, so skipping would only throw away good tracks
+                    logger.warning(f"Not starting {track.title}, bot is busy: {e}")
+                    player.now_playing = None
+                    self.bot.store.save(player)
+                    await self.send_notice(message_channel, "The bot is busy right now, use /play to try again in a moment.")
+                    return
+                except Exception as e:
+                    logger.error(f"Error fetching track info: {str(e)}")
+                    logger.error(f"Track details: {track}")
+                    # Network errors and rate limits are retried next time, only videos that are gone are remembered
+                    if isinstance(e, TrackUnavailable):
+                        self.mark_unavailable(track)
+                    failures += 1
+
+            logger.info(f"Skipping unavailable track: {track.title}")
+            skipped += 1
+            start_at = None  # A resume point only applies to the track it was saved for
+
+            if player.current_song:
+                player.current_song = None
+                player.now_playing = None
+                return
+
+            if failures >= PLAYBACK_RETRY_LIMIT or skipped >= len(player.queue):
+                player.now_playing = None
+                await self.send_notice(message_channel, f"Skipped {skipped} unavailable song(s), stopping playback.")
+                return
+
+            position += 1
+            if position >= len(player.queue):
+                if player.repeat_mode != 'all':
+                    # Mark the queue as finished
+                    player.position = len(player.queue)
+                    player.now_playing = None
+                    self.bot.store.save(player)
+                    await self.send_notice(message_channel, f"Reached the end of the queue, skipped {skipped} unavailable song(s).")
+                    return
+                position = 0
+
+        if skipped:
+            await self.send_notice(message_channel, f"Skipped {skipped} unavailable song(s).")
+
+        try:
+            crossfade = player.crossfade
+
+            # Wrap it so the next track can be swapped in without a gap
+            transformed_source = GaplessSource(
                 audio_source,
-                volume=self.bot.volume_levels.get(guild.id, 1.0)
+                duration=stream.get('duration') or track.duration,
+                prespawn_seconds=PRESPAWN_SECONDS,
+                crossfade_seconds=crossfade,
+                on_near_end=lambda: self.request_prespawn(guild),
+                on_transition=lambda meta: asyncio.run_coroutine_threadsafe(
+                    self.track_transitioned(guild, transformed_source, meta),
+                    self.bot.loop
+                ),
+                on_gap=self.record_gap,
+                gap_start=player.track_ended_at,
+                start_offset=start_at,
+                on_premature_end=lambda position: self.request_stream_recovery(guild, position),
+                premature_tolerance=PREMATURE_EOF_TOLERANCE
             )
+            player.track_ended_at = None
+            done = asyncio.Event()
 
             def after_callback(error):
+                player.track_ended_at = time.monotonic()
+                self.bot.loop.call_soon_threadsafe(done.set)
                 if error and str(error) != "Already playing audio.":
                     logger.error(f'Player error: {error}')
                 else:
                     future = asyncio.run_coroutine_threadsafe(
-                        self.song_finished(guild),
+                        self.song_finished(guild, transformed_source),
                         self.bot.loop
                     )
-                    try:
-                        future.result()
-                    except Exception as e:
-                        if "Already playing audio" not in str(e):
-                            logger.error(f'Error in song_finished callback: {e}')
+                    future.add_done_callback(log_song_finished_error)
+
+            def log_song_finished_error(future):
+                if not future.cancelled() and future.exception():
+                    logger.error(f'Error in song_finished callback: {future.exception()}')
 
             # Ensure we're not already playing
             if not voice_client.is_playing():
+                player.gapless_source = transformed_source
+                player.current_stream = stream
+                player.playback_done = done
                 voice_client.play(
                     transformed_source,
                     after=after_callback
                 )
 
-                safe_title = track['title'].encode('ascii', 'ignore').decode('ascii')
+                safe_title = track.title.encode('ascii', 'ignore').decode('ascii')
                 logger.info(f"Started playing: {safe_title}")
-                
-                # Only send message if not being called from a command
-                if not interaction:
-                    await self.send_playing_message(guild, track, command_channel=command_channel)
+
+                self.on_track_started(player, track, stream)
+
+                # Only send message if not being called from a command, or if that command's song was skipped
+                if not interaction or skipped:
+                    await self.send_playing_message(guild, track, command_channel=message_channel)
+            else:
+                audio_source.cleanup()
 
         except Exception as e:
             logger.error(f"Error playing track: {str(e)}", exc_info=True)
-            # Try to recover by playing next song
-            next_pos = self.current_position.get(guild.id, 0) + 1
-            if next_pos < len(self.bot.music_queues[guild.id]):
-                self.current_position[guild.id] = next_pos
-                await self.play_next(guild, command_channel=command_channel)
-
-    async def handle_playback_error(self, guild):
-        """Handle playback errors by attempting to restart the track"""
+            audio_source.cleanup()
+
+    async def open_track(self, guild, player, track, start_at=None):
+        """Resolve a track and spawn its FFmpeg, returns (stream, audio source)"""
+        # Use the prefetched stream if it was resolved for this track
+        stream = await self.get_cached_audio(track) or self.take_prefetched(player, track)
+        if not stream:
+            stream = await self.resolve_stream(track)
+
+        try:
+            audio_source = self.create_audio_source(guild, track, stream, force_pcm=player.crossfade > 0, start_at=start_at)
+        except Exception as e:
+            logger.error(f"Error creating FFmpeg audio source: {str(e)}")
+            logger.error(f"URL: {stream['url']}")
+            raise
+        return stream, audio_source
+
+    @staticmethod
+    async def send_notice(channel, content):
+        """Send a plain status message, ignoring channels we can't post in"""
+        if not channel:
+            return
         try:
-            if guild.id in self.bot.music_queues and self.bot.music_queues[guild.id]:
-                current_track = self.bot.music_queues[guild.id][0]
-                logger.info(f"Attempting to restart track: {current_track['title']}")
-                await self.play_next(guild)
+            await channel.send(content)
         except Exception as e:
-            logger.error(f"Error in handle_playback_error: {e}")
-            if guild.id in self.bot.music_queues and self.bot.music_queues[guild.id]:
-                self.bot.music_queues[guild.id].pop(0)
-            await self.play_next(guild)
+            logger.debug(f"Could not send notice: {e}")
 
     async def send_playing_message(self, guild, track_info, interaction=None, command_channel=None):
         """Send a message indicating what's playing"""
         try:
             embed = discord.Embed(
                 title="Now Playing",
-                description=f"🎵 {track_info['title']}",
+                description=f"🎵 {track_info.title}",
                 color=discord.Color.blue()
             )
             
@@ -222,9 +1109,10 @@ class Music(commands.Cog):
 
     @app_commands.command(name="play", description="Play a song from YouTube or queue")
     async def play(self, interaction: discord.Interaction, query: Optional[str] = None, position: Optional[int] = None):
+        player = self.bot.get_player(interaction.guild.id)
         # Store the original channel when starting playback
-        if not interaction.guild.id in self.bot.music_queues:
-            self.original_channels[interaction.guild.id] = interaction.channel
+        if player.original_channel is None:
+            player.original_channel = interaction.channel
         
         await interaction.response.defer()
 
@@ -241,38 +1129,14 @@ class Music(commands.Cog):
 
         # If position is provided, play from that position
         if position is not None:
-            if not interaction.guild.id in self.bot.music_queues:
+            if not player.queue:
                 return await interaction.followup.send("Queue is empty!")
             
-            queue_length = len(self.bot.music_queues[interaction.guild.id])
+            queue_length = len(player.queue)
             if position < 1 or position > queue_length:
                 return await interaction.followup.send(f"Invalid position! Please choose between 1 and {queue_length}")
             
-            # Calculate position index
-            position_index = position - 1
-            
-            # Clear any queued position from /queue position command
-            if hasattr(self.bot, 'next_position'):
-                delattr(self.bot, 'next_position')
-            
-            # Ensure clean state before playing
-            if interaction.guild.voice_client.is_playing():
-                self.skip_next_progression[interaction.guild.id] = True  # Set flag before stopping
-                self.current_song = None  # Clear any current_song
-                interaction.guild.voice_client.stop()
-                await asyncio.sleep(0.5)
-            
-            # Update position
-            self.current_position[interaction.guild.id] = position_index
-            
-            # Play the selected song and send styled message as reply
-            track = self.bot.music_queues[interaction.guild.id][position_index]
-            await self.send_playing_message(interaction.guild, track, interaction)
-            
-            # Reset the skip flag before playing to allow auto-progression
-            self.skip_next_progression[interaction.guild.id] = False
-            await self.play_next(interaction.guild, interaction=interaction)
-            return
+            return await self.play_from_position(interaction, player, position - 1)
 
         # If no query, resume from stopped position or continue playing
         if not query:
@@ -281,176 +1145,198 @@ class Music(commands.Cog):
                 await interaction.followup.send("Resumed playback!")
                 return
             elif not interaction.guild.voice_client.is_playing():
-                if interaction.guild.id in self.bot.music_queues and self.bot.music_queues[interaction.guild.id]:
+                if player.queue:
                     # Reset position to start of queue if previous song ended
-                    if self.current_position.get(interaction.guild.id, 0) >= len(self.bot.music_queues[interaction.guild.id]):
-                        self.current_position[interaction.guild.id] = 0
-                    await self.play_next(interaction.guild)
-                    await interaction.followup.send("Playing from queue!")
+                    if player.position >= len(player.queue):
+                        player.position = 0
+                        player.stopped_at = None
+
+                    # Resume the stopped song where it left off
+                    async with player.lock:
+                        track = player.queue[player.position]
+                        start_at = self.take_resume_point(player, track)
+                        await self.start_playback(interaction.guild, start_at=start_at)
+                    if start_at:
+                        await interaction.followup.send(f"Resumed {track.title} from {format_timestamp(start_at)}!")
+                    else:
+                        await interaction.followup.send("Playing from queue!")
                 else:
                     await interaction.followup.send("Queue is empty! Provide a song to play.")
             else:
                 await interaction.followup.send("Already playing! Use /queue to see the current queue.")
             return
 
-        # Check if the query is a URL
-        is_url = re.match(r'https?://(?:www\.)?.+', query) is not None
-        if not is_url:
-            query = f"ytsearch:{query}"
-
-        # Get track info
-        info = await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: self.ydl.extract_info(query, download=False)
-        )
-        
-        tracks_to_add = []
-        
-        if 'entries' in info:  # Playlist or search results
-            if 'playlist' in query or 'list=' in query:  # It's a playlist
-                await interaction.followup.send(f"Adding playlist: {info.get('title', 'Unknown playlist')}")
-                for entry in info['entries']:
-                    if entry:
-                        tracks_to_add.append({
-                            'url': entry.get('webpage_url', None) or f"https://www.youtube.com/watch?v={entry['id']}",
-                            'title': entry.get('title', 'Unknown'),
-                            'duration': entry.get('duration', 0)
-                        })
-            else:  # Search result
-                entry = info['entries'][0]
-                tracks_to_add.append({
-                    'url': entry.get('webpage_url', None) or f"https://www.youtube.com/watch?v={entry['id']}",
-                    'title': entry.get('title', 'Unknown'),
-                    'duration': entry.get('duration', 0)
-                })
-        else:  # Single track
-            tracks_to_add.append({
-                'url': info.get('webpage_url', None) or f"https://www.youtube.com/watch?v={info['id']}",
-                'title': info.get('title', 'Unknown'),
-                'duration': info.get('duration', 0)
-            })
+        try:
+            if self.is_playlist_query(query):
+                return await self.ingest_playlist(interaction, query, start_playing=True)
+            tracks_to_add, playlist_title = await self.fetch_tracks(query)
+        except (ExtractionError, ExtractionQueueFull) as e:
+            return await interaction.followup.send(f"An error occurred: {str(e)}")
+        if playlist_title:
+            await interaction.followup.send(f"Adding playlist: {playlist_title}")
         
         # Add all tracks to queue
-        for track in tracks_to_add:
-            self.bot.music_queues.setdefault(interaction.guild.id, []).append(track)
+        player.queue.extend(tracks_to_add, added_by=interaction.user.id)
+        self.refresh_prefetch(interaction.guild)
         
         if len(tracks_to_add) > 1:
             await interaction.followup.send(f"Added {len(tracks_to_add)} tracks to queue")
         else:
-            await interaction.followup.send(f"Added to queue: {tracks_to_add[0]['title']}")
+            await interaction.followup.send(f"Added to queue: {tracks_to_add[0].title}")
         
         # Start playing if not already playing
-        if not interaction.guild.voice_client.is_playing():
-            await self.play_next(guild=interaction.guild, command_channel=interaction.channel)
+        await self.play_if_idle(interaction.guild, command_channel=interaction.channel)
             
-    @app_commands.command(name="next", description="Play the next song")
-    async def next(self, interaction: discord.Interaction):
+    async def play_from_position(self, interaction, player, position_index):
+        """Stop the current song and play the queue from position_index"""
+        async with player.lock:
+            # Clear any queued position from /queue position command
+            player.next_position = None
+            self.invalidate_prefetch(player)
+            
+            # Ensure clean state before playing
+            if interaction.guild.voice_client.is_playing():
+                player.current_song = None  # Clear any current_song
+            await self.stop_playback(interaction.guild, player)
+            
+            # Update position
+            player.position = position_index
+            
+            # Play the selected song and send styled message as reply
+            track = player.queue[position_index]
+            await self.send_playing_message(interaction.guild, track, interaction)
+            await self.start_playback(interaction.guild, interaction=interaction)
+
+    @app_commands.command(name="jump", description="Jump to a song in the queue by title")
+    @app_commands.describe(title="Words from the song's title")
+    async def jump(self, interaction: discord.Interaction, title: str):
         if not interaction.guild.voice_client:
             return await interaction.response.send_message("I'm not playing anything!")
         
-        if not interaction.guild.id in self.bot.music_queues:
+        player = self.bot.get_player(interaction.guild.id)
+        if not player.queue:
             return await interaction.response.send_message("Queue is empty!")
         
-        current_pos = self.current_position.get(interaction.guild.id, 0)
-        next_pos = current_pos + 1
-        
-        # Check if we can go to next song
-        if next_pos >= len(self.bot.music_queues[interaction.guild.id]):
-            if self.bot.repeat_modes.get(interaction.guild.id) == 'all':
-                next_pos = 0
-            else:
-                return await interaction.response.send_message("No more songs in queue!")
+        # Autocomplete choices carry the position, anything typed by hand is searched
+        match = JUMP_CHOICE_PATTERN.fullmatch(title)
+        if match:
+            position_index = int(match.group(1)) - 1
+            # The queue may have changed since the choice was suggested
+            if not 0 <= position_index < len(player.queue) or (player.queue[position_index].video_id or '') != match.group(2):
+                return await interaction.response.send_message("The queue changed since that song was suggested, please pick it again.")
+        else:
+            matches = player.queue.search(title, limit=1)
+            position_index = matches[0] if matches else -1
+        if not 0 <= position_index < len(player.queue):
+            return await interaction.response.send_message(f"No song in the queue matches: {title}")
         
-        # Update position
-        self.current_position[interaction.guild.id] = next_pos
+        await interaction.response.defer()
+        await self.play_from_position(interaction, player, position_index)
+
+    @jump.autocomplete('title')
+    async def jump_autocomplete(self, interaction: discord.Interaction, current: str):
+        player = self.bot.players.get(interaction.guild.id) if interaction.guild else None
+        if not player or not player.queue:
+            return []
         
-        # Stop current playback
-        if interaction.guild.voice_client.is_playing():
-            self.skip_next_progression[interaction.guild.id] = True  # Prevent auto-progression
-            interaction.guild.voice_client.stop()
-            await asyncio.sleep(0.5)
+        queue = player.queue
+        if current.strip():
+            positions = queue.search(current, limit=JUMP_CHOICES)
+        else:
+            # Nothing typed yet, suggest what's coming up
+            positions = range(min(player.position, len(queue) - 1), min(player.position + JUMP_CHOICES, len(queue)))
+        return [
+            app_commands.Choice(name=f"{position + 1}. {queue[position].title}"[:100], value=f"#{position + 1}:{queue[position].video_id or ''}")
+            for position in positions
+        ]
+
+    @app_commands.command(name="next", description="Play the next song")
+    async def next(self, interaction: discord.Interaction):
+        if not interaction.guild.voice_client:
+            return await interaction.response.send_message("I'm not playing anything!")
         
-        # Play next song
-        next_song = self.bot.music_queues[interaction.guild.id][next_pos]['title']
-        await interaction.response.send_message(f"Playing next song: {next_song}")
-        await self.play_next(interaction.guild, force_position=next_pos, command_channel=interaction.channel)
+        player = self.bot.get_player(interaction.guild.id)
+        async with player.lock:
+            if not player.queue:
+                return await interaction.response.send_message("Queue is empty!")
+            
+            next_pos = player.position + 1
+            
+            # Check if we can go to next song
+            if next_pos >= len(player.queue):
+                if player.repeat_mode == 'all':
+                    next_pos = 0
+                else:
+                    return await interaction.response.send_message("No more songs in queue!")
+            
+            # Play next song
+            next_song = player.queue[next_pos].title
+            await interaction.response.send_message(f"Playing next song: {next_song}")
+            await self.start_playback(interaction.guild, force_position=next_pos, command_channel=interaction.channel)
 
     @app_commands.command(name="previous", description="Play the previous song")
     async def previous(self, interaction: discord.Interaction):
         if not interaction.guild.voice_client:
             return await interaction.response.send_message("I'm not playing anything!")
         
-        if not interaction.guild.id in self.bot.music_queues:
-            return await interaction.response.send_message("Queue is empty!")
-        
-        current_pos = self.current_position.get(interaction.guild.id, 0)
-        if current_pos > 0:
-            # Set position to previous song
-            prev_pos = current_pos - 1
+        player = self.bot.get_player(interaction.guild.id)
+        async with player.lock:
+            if not player.queue:
+                return await interaction.response.send_message("Queue is empty!")
             
-            # Stop current playback
-            if interaction.guild.voice_client.is_playing():
-                self.skip_next_progression[interaction.guild.id] = True  # Set flag before stopping
-                interaction.guild.voice_client.stop()
-                await asyncio.sleep(0.5)
-            
-            # Update position and ensure no auto-progression
-            self.current_position[interaction.guild.id] = prev_pos
-            self.skip_next_progression[interaction.guild.id] = True
+            if player.position > 0:
+                # Set position to previous song
+                prev_pos = player.position - 1
+            elif player.repeat_mode == 'all':
+                # If at the start of queue, go to the end if repeat mode is on
+                prev_pos = len(player.queue) - 1
+            else:
+                return await interaction.response.send_message("No previous songs in queue!")
             
             # Play the previous song
-            prev_song = self.bot.music_queues[interaction.guild.id][prev_pos]['title']
+            prev_song = player.queue[prev_pos].title
             await interaction.response.send_message(f"Playing previous song: {prev_song}")
-            await self.play_next(interaction.guild, force_position=prev_pos, command_channel=interaction.channel)
-        else:
-            # If at the start of queue, go to the end if repeat mode is on
-            if self.bot.repeat_modes.get(interaction.guild.id) == 'all':
-                prev_pos = len(self.bot.music_queues[interaction.guild.id]) - 1
-                
-                if interaction.guild.voice_client.is_playing():
-                    self.skip_next_progression[interaction.guild.id] = True  # Set flag before stopping
-                    interaction.guild.voice_client.stop()
-                    await asyncio.sleep(0.5)
-                
-                # Update position and ensure no auto-progression
-                self.current_position[interaction.guild.id] = prev_pos
-                self.skip_next_progression[interaction.guild.id] = True
-                
-                prev_song = self.bot.music_queues[interaction.guild.id][prev_pos]['title']
-                await interaction.response.send_message(f"Playing previous song: {prev_song}")
-                await self.play_next(interaction.guild, force_position=prev_pos, command_channel=interaction.channel)
-            else:
-                await interaction.response.send_message("No previous songs in queue!")
+            await self.start_playback(interaction.guild, force_position=prev_pos, command_channel=interaction.channel)
 
     @app_commands.command(name="stop", description="Stop the current song")
     async def stop(self, interaction: discord.Interaction):
         if not interaction.guild.voice_client:
             return await interaction.response.send_message("I'm not playing anything!")
         
-        # Store current position
-        self.stopped_position[interaction.guild.id] = self.current_position.get(interaction.guild.id, 0)
-        
-        # Set flag to prevent auto-progression
-        self.skip_next_progression[interaction.guild.id] = True
-        
-        # Clear queue if auto-clear is enabled
-        if self.auto_clear.get(interaction.guild.id, False):
-            self.bot.music_queues[interaction.guild.id] = []
-            await interaction.response.send_message("Stopped playing and cleared queue!")
-        else:
-            # Only show resume message if there are songs in queue
-            if self.bot.music_queues.get(interaction.guild.id):
-                await interaction.response.send_message("Stopped playing! Use `/play` to resume from where you left off.")
+        player = self.bot.get_player(interaction.guild.id)
+        async with player.lock:
+            # Store current position
+            player.stopped_position = player.position
+            self.invalidate_prefetch(player)
+
+            # Remember how far into the song we were so /play resumes there
+            playback_position = self.get_playback_position(player)
+            track = player.now_playing
+            if playback_position and track:
+                player.stopped_at = (track.url, playback_position)
+            self.bot.store.save(player)
+            
+            # Clear queue if auto-clear is enabled
+            if player.auto_clear:
+                player.queue = TrackQueue()
+                self.cancel_playlist_loading(player)
+                await interaction.response.send_message("Stopped playing and cleared queue!")
             else:
-                await interaction.response.send_message("Stopped playing!")
-        
-        # Stop playback
-        interaction.guild.voice_client.stop()
+                # Only show resume message if there are songs in queue
+                if player.queue:
+                    await interaction.response.send_message("Stopped playing! Use `/play` to resume from where you left off.")
+                else:
+                    await interaction.response.send_message("Stopped playing!")
+            
+            # Stop playback without moving on to the next song
+            await self.stop_playback(interaction.guild, player)
 
     @app_commands.command(name="repeat", description="Set repeat mode")
     async def repeat(self, interaction: discord.Interaction, mode: Literal['off', 'all', 'single']):
-        self.bot.repeat_modes[interaction.guild.id] = mode
-        queue_length = len(self.bot.music_queues.get(interaction.guild.id, []))
+        player = self.bot.get_player(interaction.guild.id)
+        player.repeat_mode = mode
+        self.refresh_prefetch(interaction.guild)
+        queue_length = len(player.queue)
         
         messages = {
             'off': "Repeat mode disabled",
@@ -462,8 +1348,10 @@ class Music(commands.Cog):
 
     @app_commands.command(name="loop", description="Loop current song")
     async def loop(self, interaction: discord.Interaction, mode: Literal['off', 'on', 'single']):
-        self.bot.loop_modes[interaction.guild.id] = mode
-        current_track = self.bot.now_playing.get(interaction.guild.id, {}).get('title', 'Nothing')
+        player = self.bot.get_player(interaction.guild.id)
+        player.loop_mode = mode
+        self.refresh_prefetch(interaction.guild)
+        current_track = player.now_playing.title if player.now_playing else 'Nothing'
         
         messages = {
             'off': "Loop mode disabled",
@@ -479,7 +1367,8 @@ class Music(commands.Cog):
             return await interaction.response.send_message("I'm not in a voice channel!")
         
         await interaction.guild.voice_client.disconnect()
-        self.bot.music_queues[interaction.guild.id] = []
+        # Drops the guild's player, saved queue included
+        await self.cleanup(interaction.guild.id, forget=True)
         await interaction.response.send_message("Disconnected from voice channel!")
 
     @app_commands.command(name="queue", description="Show, add to, or manage queue")
@@ -491,73 +1380,79 @@ class Music(commands.Cog):
     async def queue(self, interaction: discord.Interaction, 
                    query: Optional[str] = None, 
                    position: Optional[int] = None, 
-                   action: Optional[Literal['clear', 'autoclear on', 'autoclear off']] = None):
+                   action: Optional[Literal['clear', 'dedupe', 'autoclear on', 'autoclear off']] = None):
         await interaction.response.defer()
+        player = self.bot.get_player(interaction.guild.id)
 
         # Store the original channel when using queue command
-        if not interaction.guild.id in self.original_channels:
-            self.original_channels[interaction.guild.id] = interaction.channel
+        if player.original_channel is None:
+            player.original_channel = interaction.channel
 
         # Handle actions
         if action:
             if action == 'clear':
-                if not interaction.guild.id in self.bot.music_queues:
+                if not player.queue:
                     return await interaction.followup.send("Queue is already empty!")
                 
                 # Store current playing song if any
                 if interaction.guild.voice_client and interaction.guild.voice_client.is_playing():
-                    current_pos = self.current_position.get(interaction.guild.id, 0)
-                    self.current_song = self.bot.music_queues[interaction.guild.id][current_pos]
+                    current_pos = player.position
+                    player.current_song = player.queue[current_pos]
                     await interaction.followup.send("Queue cleared! Current song will finish playing.")
                 else:
-                    self.current_song = None
+                    player.current_song = None
                     await interaction.followup.send("Queue cleared!")
                 
                 # Clear the queue
-                self.bot.music_queues[interaction.guild.id] = []
+                player.queue = TrackQueue()
+                self.invalidate_prefetch(player)
+                self.cancel_playlist_loading(player)
+                self.bot.store.save(player)
+                return
+            
+            elif action == 'dedupe':
+                async with player.lock:
+                    # Keeps the first copy of each song
+                    positions = player.queue.duplicates()
+                    player.queue.remove_positions(positions)
+                    self.positions_removed(interaction.guild, player, positions)
+                if not positions:
+                    return await interaction.followup.send("No duplicate songs in the queue!")
+                self.refresh_prefetch(interaction.guild)
+                await interaction.followup.send(f"Removed {len(positions)} duplicate song(s) from the queue.")
                 return
             
             elif action == 'autoclear on':
-                self.auto_clear[interaction.guild.id] = True
+                player.auto_clear = True
+                self.bot.store.save(player)
                 await interaction.followup.send("Auto-clear on stop has been enabled.")
                 return
             
             elif action == 'autoclear off':
-                self.auto_clear[interaction.guild.id] = False
+                player.auto_clear = False
+                self.bot.store.save(player)
                 await interaction.followup.send("Auto-clear on stop has been disabled.")
                 return
 
         # Show queue if no query and no position
         if not query and position is None:
-            if not interaction.guild.id in self.bot.music_queues or not self.bot.music_queues[interaction.guild.id]:
+            if not player.queue:
                 return await interaction.followup.send("Queue is empty!")
             
-            queue_list = ""
-            current_pos = self.current_position.get(interaction.guild.id, 0)
-            
-            for i, track in enumerate(self.bot.music_queues[interaction.guild.id], 1):
-                prefix = "▶️ " if i-1 == current_pos else f"{i}. "
-                queue_list += f"{prefix}{track['title']}\n"
-            
-            if hasattr(self.bot, 'next_position') and self.bot.next_position.get('guild_id') == interaction.guild.id:
-                next_pos = self.bot.next_position['position']
-                next_song = self.bot.music_queues[interaction.guild.id][next_pos]['title']
-                queue_list += f"\nNext up: {next_song}"
-            
-            embed = discord.Embed(
-                title="Current Queue",
-                description=queue_list,
-                color=discord.Color.blue()
-            )
-            await interaction.followup.send(embed=embed)
+            view = QueueView(player)
+            embed = view.build_embed()
+            if view.page_count == 1:
+                await interaction.followup.send(embed=embed)
+            else:
+                view.message = await interaction.followup.send(embed=embed, view=view, wait=True)
             return
 
         # If position is provided, queue from that position
         if position is not None:
-            if not interaction.guild.id in self.bot.music_queues:
+            if not player.queue:
                 return await interaction.followup.send("Queue is empty!")
             
-            queue_length = len(self.bot.music_queues[interaction.guild.id])
+            queue_length = len(player.queue)
             if position < 1 or position > queue_length:
                 return await interaction.followup.send(f"Invalid position! Please choose between 1 and {queue_length}")
             
@@ -565,17 +1460,16 @@ class Music(commands.Cog):
             position_index = position - 1
             
             # Clear any current_song when using position command
-            self.current_song = None
+            player.current_song = None
             
             # Store the position to play next with channel info
-            self.bot.next_position = {
-                'guild_id': interaction.guild.id,
+            player.next_position = {
                 'position': position_index,
-                'suppress_message': True,
                 'channel': interaction.channel
             }
+            self.refresh_prefetch(interaction.guild)
             
-            selected_song = self.bot.music_queues[interaction.guild.id][position_index]['title']
+            selected_song = player.queue[position_index].title
             await interaction.followup.send(f"Next up: {selected_song} (will play after current song ends)")
             return
 
@@ -588,155 +1482,523 @@ class Music(commands.Cog):
                 await interaction.user.voice.channel.connect()
 
             # Add to queue without playing
-            is_url = re.match(r'https?://(?:www\.)?.+', query) is not None
-            if not is_url:
-                query = f"ytsearch:{query}"
-
-            info = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.ydl.extract_info(query, download=False)
-            )
-            
-            tracks_to_add = []
-            
-            if 'entries' in info:  # Playlist or search results
-                if 'playlist' in query or 'list=' in query:  # It's a playlist
-                    await interaction.followup.send(f"Adding playlist: {info.get('title', 'Unknown playlist')}")
-                    for entry in info['entries']:
-                        if entry:
-                            tracks_to_add.append({
-                                'url': entry.get('webpage_url', None) or f"https://www.youtube.com/watch?v={entry['id']}",
-                                'title': entry.get('title', 'Unknown'),
-                                'duration': entry.get('duration', 0)
-                            })
-                else:  # Search result
-                    entry = info['entries'][0]
-                    tracks_to_add.append({
-                        'url': entry.get('webpage_url', None) or f"https://www.youtube.com/watch?v={entry['id']}",
-                        'title': entry.get('title', 'Unknown'),
-                        'duration': entry.get('duration', 0)
-                    })
-            else:  # Single track
-                tracks_to_add.append({
-                    'url': info.get('webpage_url', None) or f"https://www.youtube.com/watch?v={info['id']}",
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration', 0)
-                })
+            if self.is_playlist_query(query):
+                return await self.ingest_playlist(interaction, query)
+            tracks_to_add, playlist_title = await self.fetch_tracks(query)
+            if playlist_title:
+                await interaction.followup.send(f"Adding playlist: {playlist_title}")
             
             # Add all tracks to queue
-            for track in tracks_to_add:
-                self.bot.music_queues.setdefault(interaction.guild.id, []).append(track)
+            player.queue.extend(tracks_to_add, added_by=interaction.user.id)
+            self.refresh_prefetch(interaction.guild)
             
             if len(tracks_to_add) > 1:
                 await interaction.followup.send(f"Added {len(tracks_to_add)} tracks to queue")
             else:
-                await interaction.followup.send(f"Added to queue: {tracks_to_add[0]['title']}")
+                await interaction.followup.send(f"Added to queue: {tracks_to_add[0].title}")
             
         except Exception as e:
             logger.error(f"Error in queue command: {e}")
             await interaction.followup.send(f"An error occurred: {str(e)}")
 
+    @staticmethod
+    def shift_for_removal(position, removed):
+        """New position of the song at position once the ascending positions in removed are gone, and whether it was one of them"""
+        before = bisect_left(removed, position)
+        return position - before, before < len(removed) and removed[before] == position
+
+    @staticmethod
+    def shift_for_move(position, source, destination):
+        """New position of the song at position once the song at source moves to destination"""
+        if position == source:
+            return destination
+        if source < position <= destination:
+            return position - 1
+        if destination <= position < source:
+            return position + 1
+        return position
+
+    def positions_removed(self, guild, player, removed):
+        """Keep the current and queued-next positions on the same songs after tracks were removed"""
+        if not removed:
+            return
+        if player.next_position:
+            next_pos, gone = self.shift_for_removal(player.next_position['position'], removed)
+            player.next_position = None if gone else {**player.next_position, 'position': next_pos}
+
+        position, gone = self.shift_for_removal(player.position, removed)
+        if gone and not player.current_song:
+            voice_client = guild.voice_client
+            playing = voice_client and (voice_client.is_playing() or voice_client.is_paused())
+            if not player.queue:
+                # Like /queue clear, the current song finishes on its own
+                if playing:
+                    player.current_song = player.now_playing
+                position = 0
+            elif playing and player.next_position is None and position < len(player.queue):
+                # Carry on with the song that took the removed one's place
+                player.next_position = {'position': position, 'channel': None}
+        player.position = position
+
+    @app_commands.command(name="remove", description="Remove songs from the queue")
+    @app_commands.describe(
+        position="Position of the song to remove, or the start of a range",
+        end="Last position of the range to remove",
+        user="Remove every song this user added"
+    )
+    async def remove(self, interaction: discord.Interaction,
+                     position: Optional[int] = None,
+                     end: Optional[int] = None,
+                     user: Optional[discord.Member] = None):
+        await interaction.response.defer()
+        player = self.bot.get_player(interaction.guild.id)
+        if not player.queue:
+            return await interaction.followup.send("Queue is empty!")
+        if (position is None) == (user is None):
+            return await interaction.followup.send("Choose either a position (with an optional end) or a user!")
+
+        async with player.lock:
+            queue = player.queue
+            if user is not None:
+                positions = queue.queued_by(user.id)
+                if not positions:
+                    return await interaction.followup.send(f"No songs in the queue were added by {user.display_name}!")
+                queue.remove_positions(positions)
+                self.positions_removed(interaction.guild, player, positions)
+                message = f"Removed {len(positions)} song(s) added by {user.display_name}."
+            else:
+                end = position if end is None else end
+                queue_length = len(queue)
+                if not 1 <= position <= end <= queue_length:
+                    return await interaction.followup.send(f"Invalid position! Please choose between 1 and {queue_length}")
+                removed = queue.remove(position - 1, end)
+                self.positions_removed(interaction.guild, player, range(position - 1, end))
+                message = f"Removed {removed[0].title}" if len(removed) == 1 else f"Removed {len(removed)} songs from the queue."
+
+        self.refresh_prefetch(interaction.guild)
+        await interaction.followup.send(message)
+
+    @app_commands.command(name="move", description="Move a song to another position in the queue")
+    @app_commands.describe(source="Position of the song to move", destination="Position to move it to")
+    async def move(self, interaction: discord.Interaction, source: int, destination: int):
+        await interaction.response.defer()
+        player = self.bot.get_player(interaction.guild.id)
+        async with player.lock:
+            queue_length = len(player.queue)
+            if not queue_length:
+                return await interaction.followup.send("Queue is empty!")
+            if not (1 <= source <= queue_length and 1 <= destination <= queue_length):
+                return await interaction.followup.send(f"Invalid position! Please choose between 1 and {queue_length}")
+
+            player.queue.move(source - 1, destination - 1)
+            player.position = self.shift_for_move(player.position, source - 1, destination - 1)
+            if player.next_position:
+                next_pos = self.shift_for_move(player.next_position['position'], source - 1, destination - 1)
+                player.next_position = {**player.next_position, 'position': next_pos}
+            title = player.queue[destination - 1].title
+
+        self.refresh_prefetch(interaction.guild)
+        await interaction.followup.send(f"Moved {title} to position {destination}")
+
     @app_commands.command(name="shuffle", description="Shuffle the current queue")
-    async def shuffle(self, interaction: discord.Interaction):
-        if not interaction.guild.id in self.bot.music_queues or not self.bot.music_queues[interaction.guild.id]:
+    @app_commands.describe(mode="Shuffle again, or go back to the original order")
+    async def shuffle(self, interaction: discord.Interaction, mode: Literal['on', 'off'] = 'on'):
+        player = self.bot.get_player(interaction.guild.id)
+        if not player.queue:
             return await interaction.response.send_message("Queue is empty!")
         
-        # Keep current playing song in its position
-        current_pos = self.current_position.get(interaction.guild.id, 0)
-        current = self.bot.music_queues[interaction.guild.id][current_pos]
+        if mode == 'off':
+            if not player.queue.shuffled:
+                return await interaction.response.send_message("Queue is not shuffled!")
+            # Keep following the current song in the original order
+            player.position = player.queue.unshuffle(player.position)
+            self.refresh_prefetch(interaction.guild)
+            return await interaction.response.send_message("Queue restored to its original order!")
         
-        # Get all songs except current one
-        remaining = self.bot.music_queues[interaction.guild.id][:current_pos] + self.bot.music_queues[interaction.guild.id][current_pos + 1:]
-        random.shuffle(remaining)
-        
-        # Reconstruct queue with current song in its original position
-        self.bot.music_queues[interaction.guild.id] = (
-            remaining[:current_pos] + 
-            [current] + 
-            remaining[current_pos:]
-        )
+        # Only the play order is shuffled, the current song keeps its position
+        player.queue.shuffle(keep=player.position)
+        self.refresh_prefetch(interaction.guild)
         
         await interaction.response.send_message("Queue shuffled!")
 
+    @app_commands.command(name="volume", description="Show or set the playback volume")
+    @app_commands.describe(level="Volume from 0 to 100")
+    async def volume(self, interaction: discord.Interaction, level: Optional[app_commands.Range[int, 0, 100]] = None):
+        player = self.bot.get_player(interaction.guild.id)
+        if level is None:
+            return await interaction.response.send_message(f"Volume is {player.volume}%")
+
+        player.volume = level
+        self.bot.store.save(player)
+        await interaction.response.defer()
+        await self.apply_audio_settings(interaction.guild)
+        await interaction.followup.send(f"Volume set to {level}%")
+
+    @app_commands.command(name="normalize", description="Toggle loudness normalization")
+    async def normalize(self, interaction: discord.Interaction, mode: Literal['on', 'off']):
+        player = self.bot.get_player(interaction.guild.id)
+        player.normalize = mode == 'on'
+        self.bot.store.save(player)
+        await interaction.response.defer()
+        await self.apply_audio_settings(interaction.guild)
+        
+        messages = {
+            'on': "Loudness normalization enabled.",
+            'off': "Loudness normalization disabled."
+        }
+        
+        await interaction.followup.send(messages[mode])
+
+    async def apply_audio_settings(self, guild):
+        """Rebuild the playing source so new volume/normalization apply right away"""
+        source = self.bot.get_player(guild.id).gapless_source
+        if source and source.next_meta:
+            source.clear_next()  # Pre-spawned with the old settings
+        try:
+            await self.restart_current_track(guild)
+        except Exception as e:
+            logger.error(f"Error applying audio settings: {e}")
+
+    @app_commands.command(name="seek", description="Jump to a time in the current song")
+    @app_commands.describe(timestamp="Time to jump to, e.g. 1:23 or 83")
+    async def seek(self, interaction: discord.Interaction, timestamp: str):
+        voice_client = interaction.guild.voice_client
+        if not voice_client or not (voice_client.is_playing() or voice_client.is_paused()):
+            return await interaction.response.send_message("Nothing is playing!")
+
+        seconds = parse_timestamp(timestamp)
+        if seconds is None:
+            return await interaction.response.send_message("Invalid timestamp! Use a format like 1:23 or 83.")
+
+        track = self.bot.get_player(interaction.guild.id).now_playing
+        duration = track.duration if track else 0
+        if duration and seconds >= duration:
+            return await interaction.response.send_message(f"That's past the end of the song ({format_timestamp(duration)})!")
+
+        await interaction.response.defer()
+        try:
+            restarted = await self.restart_current_track(interaction.guild, start_at=seconds)
+        except Exception as e:
+            logger.error(f"Error seeking: {e}")
+            return await interaction.followup.send(f"An error occurred: {str(e)}")
+
+        if not restarted:
+            return await interaction.followup.send("Nothing is playing!")
+        await interaction.followup.send(f"Jumped to {format_timestamp(seconds)}")
+
+    @app_commands.command(name="crossfade", description="Set crossfade between songs")
+    @app_commands.describe(seconds=f"Crossfade length in seconds (0 to disable, max {MAX_CROSSFADE_SECONDS})")
+    async def crossfade(self, interaction: discord.Interaction, seconds: app_commands.Range[int, 0, MAX_CROSSFADE_SECONDS]):
+        player = self.bot.get_player(interaction.guild.id)
+        player.crossfade = seconds
+        self.bot.store.save(player)
+        
+        if seconds:
+            await interaction.response.send_message(f"Crossfade set to {seconds} seconds. It applies from the next song.")
+        else:
+            await interaction.response.send_message("Crossfade disabled.")
+
+    @app_commands.command(name="broadcast", description="Run or listen to a shared radio station")
+    @app_commands.describe(
+        action="What to do with the station",
+        name="Station name",
+        query="Song or playlist URL for the station (start only)"
+    )
+    async def broadcast(self, interaction: discord.Interaction,
+                        action: Literal['start', 'join', 'leave', 'stop'],
+                        name: Optional[str] = None,
+                        query: Optional[str] = None):
+        await interaction.response.defer()
+        guild = interaction.guild
+        player = self.bot.get_player(guild.id)
+
+        if action == 'leave':
+            if not player.broadcast:
+                return await interaction.followup.send("Not listening to a broadcast!")
+            station_name, player.broadcast = player.broadcast, None
+            async with player.lock:
+                await self.stop_playback(guild, player)
+            return await interaction.followup.send(f"Left broadcast: {station_name}")
+
+        if not name:
+            return await interaction.followup.send("Please provide a station name!")
+        name = name.lower()
+
+        if action == 'stop':
+            station = self.broadcasts.get(name)
+            if not station:
+                return await interaction.followup.send("No such broadcast!")
+            # Admin rights only count in the caller's own server, so other servers can't stop it
+            if station['host'] != guild.id and not await self.bot.is_owner(interaction.user):
+                return await interaction.followup.send("Only the server that started this broadcast can stop it!")
+            station['broadcast'].stop()
+            del self.broadcasts[name]
+            return await interaction.followup.send(f"Stopped broadcast: {name}")
+
+        if action == 'start':
+            existing = self.broadcasts.get(name)
+            if existing and existing['broadcast'].stopped.is_set():
+                del self.broadcasts[name]
+            elif existing:
+                return await interaction.followup.send("A broadcast with that name is already running!")
+            if not query:
+                return await interaction.followup.send("Please provide a song or playlist for the station!")
+
+            try:
+                tracks, _ = await self.fetch_tracks(query)
+            except (ExtractionError, ExtractionQueueFull) as e:
+                return await interaction.followup.send(f"An error occurred: {str(e)}")
+
+            self.broadcasts[name] = {
+                'broadcast': Broadcast(
+                    name,
+                    lambda: self.get_broadcast_source(name),
+                    buffer_frames=BROADCAST_BUFFER_FRAMES
+                ),
+                'tracks': tracks,
+                'index': 0,
+                'host': guild.id,
+                'now_playing': None
+            }
+
+        # Start and join both subscribe this guild
+        station = self.broadcasts.get(name)
+        if not station or station['broadcast'].stopped.is_set():
+            self.broadcasts.pop(name, None)
+            return await interaction.followup.send("No such broadcast!")
+
+        if not interaction.user.voice:
+            return await interaction.followup.send("You need to be in a voice channel!")
+
+        voice_client = guild.voice_client
+        if not voice_client:
+            try:
+                voice_client = await interaction.user.voice.channel.connect()
+            except Exception as e:
+                logger.error(f"Failed to connect to voice channel: {e}")
+                return await interaction.followup.send("Failed to connect to voice channel!")
+
+        async with player.lock:
+            # Hand the connection over from the normal queue
+            await self.stop_playback(guild, player)
+
+            subscriber = station['broadcast'].subscribe()
+            player.broadcast = name
+            done = player.playback_done = asyncio.Event()
+
+            def after_broadcast(error):
+                self.bot.loop.call_soon_threadsafe(done.set)
+                if error:
+                    logger.error(f"Broadcast player error: {error}")
+                if player.broadcast == name:
+                    player.broadcast = None
+
+            voice_client.play(subscriber, after=after_broadcast)
+
+        verb = "Started" if action == 'start' else "Joined"
+        listeners = station['broadcast'].listener_count()
+        await interaction.followup.send(f"{verb} broadcast: {name} ({listeners} server(s) listening)")
+
     @app_commands.command(name="setstatus", description="Set bot status (Admin only)")
     @app_commands.checks.has_permissions(administrator=True)
     async def setstatus(self, interaction: discord.Interaction, status: str):
-        await self.bot.change_presence(activity=discord.Game(name=status))
+        if self.bot.cluster:
+            # The launcher hands it to every cluster, this one included
+            self.bot.cluster.set_presence(status)
+        else:
+            await self.bot.change_presence(activity=discord.Game(name=status))
         await interaction.response.send_message(f"Status updated to: {status}")
 
-    async def song_finished(self, guild):
+    @app_commands.command(name="stats", description="Show extraction and cache statistics (Admin only)")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def stats(self, interaction: discord.Interaction):
+        embed = discord.Embed(
+            title="Bot Statistics",
+            color=discord.Color.blue()
+        )
+
+        extraction = self.extractor.stats()
+        embed.add_field(
+            name="Extraction",
+            value=(
+                f"Requests: {extraction['requests']}\n"
+                f"Deduplicated: {extraction['coalesced']}\n"
+                f"In flight: {extraction['in_flight']} | Waiting: {extraction['pending']}"
+            ),
+            inline=False
+        )
+
+        search = self.search_cache.stats()
+        embed.add_field(
+            name="Search cache",
+            value=f"Hits: {search['hits']} | Misses: {search['misses']} | Hit rate: {search['hit_rate']:.0%}",
+            inline=False
+        )
+
+        streams = stream_cache.stats()
+        embed.add_field(
+            name="Stream URL cache",
+            value=f"Hits: {streams['hits']} | Misses: {streams['misses']} | Entries: {streams['size']}",
+            inline=False
+        )
+
+        if self.broadcasts:
+            embed.add_field(
+                name="Broadcasts",
+                value="\n".join(
+                    f"{name}: {station['broadcast'].listener_count()} listener(s)"
+                    for name, station in self.broadcasts.items()
+                ),
+                inline=False
+            )
+
+        processes = self.supervisor.stats()
+        embed.add_field(
+            name="FFmpeg processes",
+            value=(
+                f"Running: {processes['running']}/{processes['max']} "
+                f"(playback {processes['playback']}, background {processes['background']})\n"
+                f"CPU: {processes['cpu_percent']:.0f}% | RSS: {processes['rss'] / 1024 ** 2:.1f} MB\n"
+                f"Killed: {processes['killed']} | Reaped: {processes['reaped']}"
+            ),
+            inline=False
+        )
+
+        if self.bot.cluster:
+            statuses = self.bot.cluster.statuses
+            totals = self.bot.cluster.totals()
+            lines = [
+                f"#{cluster_id}: shards {status['shards'][0]}-{status['shards'][-1]} | "
+                f"{status['guilds']} guilds | {status['voice']} voice | "
+                f"{status['latency_ms'] if status['latency_ms'] is not None else '?'} ms"
+                for cluster_id, status in sorted(statuses.items())
+                if status['shards']
+            ]
+            lines.append(
+                f"Total: {totals['clusters']} clusters, {totals['shards']} shards, "
+                f"{totals['guilds']} guilds, {totals['voice']} voice, {totals['players']} players"
+            )
+            embed.add_field(name=f"Clusters (this is #{self.bot.cluster.cluster_id})", value="\n".join(lines)[:1024], inline=False)
+        else:
+            embed.add_field(
+                name="Gateway",
+                value=f"Shards: {self.bot.shard_count} | Guilds: {len(self.bot.guilds)} | Voice: {len(self.bot.voice_clients)} | Latency: {self.bot.latency * 1000:.0f} ms",
+                inline=False
+            )
+
+        store = self.bot.store.stats()
+        embed.add_field(
+            name="Saved queues",
+            value=f"Guilds: {store['guilds']} | Waiting to save: {store['pending']} | Writes: {store['writes']} in {store['batches']} batches",
+            inline=False
+        )
+
+        if self.transition_gaps:
+            gaps = list(self.transition_gaps)
+            embed.add_field(
+                name="Track transitions",
+                value=(
+                    f"Average gap: {sum(gaps) / len(gaps) * 1000:.0f} ms | "
+                    f"Worst: {max(gaps) * 1000:.0f} ms (last {len(gaps)})"
+                ),
+                inline=False
+            )
+
+        if self.audio_cache:
+            audio = self.audio_cache.stats()
+            embed.add_field(
+                name="Audio cache",
+                value=(
+                    f"Hits: {audio['hits']} | Misses: {audio['misses']} | Hit rate: {audio['hit_rate']:.0%}\n"
+                    f"Served locally: {audio['bytes_served'] / 1024 ** 2:.1f} MB\n"
+                    f"Stored: {audio['files']} files, {audio['size_bytes'] / 1024 ** 2:.1f} MB"
+                ),
+                inline=False
+            )
+
+        await interaction.response.send_message(embed=embed)
+
+    async def song_finished(self, guild, source):
         """Handle song finish with proper repeat/loop logic"""
-        # If we were playing a current_song after queue clear
-        if self.current_song:
-            self.current_song = None  # Clear it
-            # If we have a new queue, start playing it
-            if guild.id in self.bot.music_queues and self.bot.music_queues[guild.id]:
-                self.current_position[guild.id] = 0
-                # Get the original channel for the message
-                original_channel = self.original_channels.get(guild.id)
-                # Send "Now Playing" message for the first song in new queue
-                if original_channel:
-                    first_song = self.bot.music_queues[guild.id][0]
-                    await self.send_playing_message(guild, first_song, command_channel=original_channel)
-                await self.play_next(guild)
-            return
+        player = self.bot.players.get(guild.id)
+        if not player:
+            return  # Disconnected, state already cleaned up
 
-        if not guild.id in self.bot.music_queues:
-            return
+        async with player.lock:
+            # Sources stopped or replaced by a command were detached first and don't advance the queue
+            if player.gapless_source is not source:
+                return
+            player.gapless_source = None
 
-        # Check if we should skip progression
-        if self.skip_next_progression.get(guild.id, False):
-            self.skip_next_progression[guild.id] = False
-            return
+            # If we were playing a current_song after queue clear
+            if player.current_song:
+                player.current_song = None  # Clear it
+                # If we have a new queue, start playing it
+                if player.queue:
+                    player.position = 0
+                    # Get the original channel for the message
+                    original_channel = player.original_channel
+                    # Send "Now Playing" message for the first song in new queue
+                    if original_channel:
+                        first_song = player.queue[0]
+                        await self.send_playing_message(guild, first_song, command_channel=original_channel)
+                    await self.start_playback(guild)
+                return
+
+            if not player.queue:
+                return
+
+            result = self.advance_position(player)
+            if result is None:
+                self.bot.store.save(player)
+                return  # End of queue reached
 
+            position, channel = result
+            await self.start_playback(guild, force_position=position, command_channel=channel)
+
+    @staticmethod
+    def advance_position(player):
+        """Move to the next queue position by the repeat/loop rules, returns (position, message channel) or None"""
         # Check if there's a queued position to play next
-        if hasattr(self.bot, 'next_position') and self.bot.next_position.get('guild_id') == guild.id:
-            next_pos = self.bot.next_position['position']
-            channel = self.bot.next_position.get('channel')
-            self.current_position[guild.id] = next_pos
-            delattr(self.bot, 'next_position')
-            await self.play_next(guild, command_channel=channel)
-            return
+        if player.next_position:
+            next_pos = player.next_position['position']
+            channel = player.next_position.get('channel')
+            player.position = next_pos
+            player.next_position = None
+            return next_pos, channel
 
         # Handle loop mode
-        if self.bot.loop_modes.get(guild.id) == 'single':
+        if player.loop_mode == 'single':
             # Play current song one more time then disable loop
-            current_pos = self.current_position.get(guild.id, 0)
-            self.bot.loop_modes[guild.id] = 'off'  # Disable after one repeat
-            await self.play_next(guild, force_position=current_pos)
-            return
-        elif self.bot.loop_modes.get(guild.id) == 'on':
+            player.loop_mode = 'off'  # Disable after one repeat
+            return player.position, None
+        elif player.loop_mode == 'on':
             # Keep playing current song
-            current_pos = self.current_position.get(guild.id, 0)
-            await self.play_next(guild, force_position=current_pos)
-            return
+            return player.position, None
 
         # Handle normal progression
-        current_pos = self.current_position.get(guild.id, 0)
+        current_pos = player.position
         next_pos = current_pos + 1
 
         # Check if we've reached the end of the queue
-        if next_pos >= len(self.bot.music_queues[guild.id]):
-            if self.bot.repeat_modes.get(guild.id) == 'all':
+        if next_pos >= len(player.queue):
+            if player.repeat_mode == 'all':
                 next_pos = 0  # Start from beginning
-            elif self.bot.repeat_modes.get(guild.id) == 'single':
+            elif player.repeat_mode == 'single':
                 next_pos = 0  # Start from beginning
-                self.bot.repeat_modes[guild.id] = 'off'  # Disable after one full repeat
+                player.repeat_mode = 'off'  # Disable after one full repeat
             else:
                 # If we have a current_song from queue clear, clear it
-                if hasattr(self, 'current_song') and self.current_song:
-                    self.current_song = None
+                player.current_song = None
                 # Mark the song as finished
-                self.current_position[guild.id] = len(self.bot.music_queues[guild.id])
-                return  # End of queue reached
+                player.position = len(player.queue)
+                return None
 
-        # Update position and play next
-        self.current_position[guild.id] = next_pos
-        self.skip_next_progression[guild.id] = False
+        # Update position
+        player.position = next_pos
         
         # Use the original channel for messages
-        original_channel = self.original_channels.get(guild.id)
-        await self.play_next(guild, command_channel=original_channel)
+        return next_pos, player.original_channel
 
     @app_commands.command(name="help", description="Shows all available commands")
     async def help(self, interaction: discord.Interaction):
@@ -756,9 +2018,18 @@ class Music(commands.Cog):
             "/repeat": "Repeats the queue. Usage: /repeat off/all/single",
             "/loop": "Loops current song. Usage: /loop off/on/single",
             "/disconnect": "Disconnects the bot from the channel",
-            "/queue": "Manage queue. Usage: /queue [optional: song/URL] [optional: position] [action: clear/autoclear on/off]",
-            "/shuffle": "Shuffles songs in the queue",
-            "/setstatus": "Sets the bot status (Admin only)"
+            "/queue": "Manage queue. Usage: /queue [optional: song/URL] [optional: position] [action: clear/dedupe/autoclear on/off]",
+            "/remove": "Removes songs from the queue. Usage: /remove [position] [optional: end] or /remove [user]",
+            "/move": "Moves a song in the queue. Usage: /move [from] [to]",
+            "/jump": "Jumps to a song in the queue by title, with suggestions as you type. Usage: /jump [title]",
+            "/shuffle": "Shuffles songs in the queue. Usage: /shuffle [on/off, off restores the original order]",
+            "/volume": "Shows or sets the volume. Usage: /volume [optional: 0-100]",
+            "/normalize": "Evens out loudness between songs. Usage: /normalize on/off",
+            "/crossfade": "Fades songs into each other. Usage: /crossfade [seconds, 0 to disable]",
+            "/seek": "Jumps to a time in the current song. Usage: /seek 1:23",
+            "/broadcast": "Shared radio across servers. Usage: /broadcast start/join/leave/stop [name] [song/playlist]",
+            "/setstatus": "Sets the bot status (Admin only)",
+            "/stats": "Shows extraction and cache statistics (Admin only)"
         }
 
         for cmd, desc in commands.items():
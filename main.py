@@ -1,14 +1,22 @@
 import discord
 from discord.ext import commands
 import asyncio
+import argparse
+import functools
 import logging
 import os
 import sys
 import requests
 import shutil
+import time
 from datetime import datetime
 from utils.ffmpeg_manager import setup_ffmpeg
+from utils.guild_player import GuildPlayer
+from utils.player_store import PlayerStore
+from utils.cluster import ClusterClient, ClusterLauncher, LOGIN_FAILED_EXIT
+from utils.command_sync import CommandSync
 import ctypes
+import multiprocessing
 
 # Configure logging
 logging.basicConfig(
@@ -23,6 +31,9 @@ logger = logging.getLogger(__name__)
 # Constants
 GITHUB_API_URL = "https://api.github.com/repos/xnull-eu/xnull-music-bot/releases/latest"
 CURRENT_VERSION = "v1.0.4"  # Update this with each release
+CLUSTER_COUNT = 1  # Worker processes, each running a range of shards (0 = one per CPU core)
+DEV_GUILD_ID = None  # Sync commands only to this guild, where changes show up instantly
+DEFAULT_STATUS = "/help | xnull.eu"  # Shown until /setstatus changes it
 
 def check_for_updates():
     """Check GitHub for new bot version"""
@@ -122,25 +133,85 @@ exit
             os.remove("update.bat")
         return False
 
-class MusicBot(commands.Bot):
-    def __init__(self):
+class MusicBot(commands.AutoShardedBot):
+    def __init__(self, shard_ids=None, shard_count=None, cluster=None, dev_guild_id=DEV_GUILD_ID, force_sync=False):
         intents = discord.Intents.default()
         intents.message_content = True
-        super().__init__(command_prefix="!", intents=intents)
+        # Without shard_count Discord's recommended number of shards is used
+        super().__init__(command_prefix="!", intents=intents, shard_ids=shard_ids, shard_count=shard_count)
         
         # Initialize bot state
-        self.music_queues = {}  # Guild ID -> List of tracks
-        self.now_playing = {}   # Guild ID -> Current track
-        self.repeat_modes = {}  # Guild ID -> Repeat mode (off/all/single)
-        self.loop_modes = {}    # Guild ID -> Loop mode (True/False)
-        self.volume_levels = {} # Guild ID -> Volume level (0-100)
+        self.players = {}  # Guild ID -> GuildPlayer
+        self.store = PlayerStore()  # Queues and settings saved under data/
+        self.cluster = cluster  # ClusterClient when this process runs one of several shard ranges
+        self.dev_guild_id = dev_guild_id
+        self.force_sync = force_sync  # Sync even if the command tree hash is unchanged
+        self.started_at = time.monotonic()
+        self.first_ready = True
+
+    @property
+    def is_primary(self):
+        """Whether this process does the once-per-bot work, like syncing commands"""
+        return self.cluster is None or self.cluster.cluster_id == 0
+
+    def get_player(self, guild_id):
+        """Get the player for a guild, creating it on first use"""
+        player = self.players.get(guild_id)
+        if player is None:
+            player = self.players[guild_id] = GuildPlayer(guild_id)
+        return player
+
+    def remove_player(self, guild_id):
+        """Forget all state for a guild"""
+        return self.players.pop(guild_id, None)
+
+    async def restore_player(self, guild_id):
+        """Get the player for a guild, loading its saved queue the first time it is used"""
+        player = self.players.get(guild_id)
+        if player:
+            return player
+
+        restored = await self.store.load(guild_id)
+        # Another command may have created the player while we were loading
+        if guild_id not in self.players and restored:
+            self.players[guild_id] = restored
+            logger.info(f"Restored {len(restored.queue)} queued track(s) for guild {guild_id}")
+        return self.get_player(guild_id)
 
     async def setup_hook(self):
+        await self.store.open()
+        if self.cluster:
+            self.cluster.start(self)
         await self.load_extension('cogs.music')
         logger.info("Music cog loaded successfully")
+        # Done once per start here instead of in on_ready, which runs again on every reconnect
+        if self.is_primary:
+            await self.sync_commands()
+
+    async def sync_commands(self):
+        """Register the slash commands with Discord if they changed since the last sync"""
+        command_sync = CommandSync(self.tree, self.application_id)
+        try:
+            if self.dev_guild_id:
+                guild = discord.Object(id=self.dev_guild_id)
+                self.tree.copy_global_to(guild=guild)
+                await command_sync.sync(guild=guild, force=self.force_sync)
+            else:
+                await command_sync.sync(force=self.force_sync)
+        except Exception as e:
+            logger.error(f"Failed to sync commands: {e}")
 
     async def on_ready(self):
-        logger.info(f'Logged in as {self.user} (ID: {self.user.id})')
+        logger.info(f'Logged in as {self.user} (ID: {self.user.id}) on {len(self.shards)} shard(s)')
+        if self.first_ready:
+            self.first_ready = False
+            logger.info(f"Ready for commands {time.monotonic() - self.started_at:.1f}s after start")
+        
+        # Keep a /setstatus from the launcher instead of resetting it on every (re)connect
+        status = (self.cluster and self.cluster.presence) or DEFAULT_STATUS
+        await self.change_presence(activity=discord.Game(name=status))
+        if not self.is_primary:
+            return
         
         # Generate and display invite link
         permissions = discord.Permissions()
@@ -161,21 +232,38 @@ class MusicBot(commands.Bot):
         print(f"\nInvite the bot to your server using this link:")
         print(f"\n{invite_link}\n")
         print("=" * 20)
-        
-        await self.change_presence(activity=discord.Game(name="/help | xnull.eu"))
-        
-        try:
-            synced = await self.tree.sync()
-            logger.info(f"Synced {len(synced)} command(s)")
-        except Exception as e:
-            logger.error(f"Failed to sync commands: {e}")
+
+    async def close(self):
+        await self.store.close()
+        await super().close()
+
+def run_cluster_worker(cluster_id, shard_ids, shard_count, token, connection, dev_guild_id=None, force_sync=False):
+    """Entry point of a cluster process started by the launcher"""
+    bot = MusicBot(
+        shard_ids=shard_ids, shard_count=shard_count, cluster=ClusterClient(cluster_id, connection),
+        dev_guild_id=dev_guild_id, force_sync=force_sync
+    )
+    try:
+        bot.run(token)
+    except discord.LoginFailure:
+        logger.error(f"Cluster {cluster_id}: invalid bot token")
+        sys.exit(LOGIN_FAILED_EXIT)
+
+def parse_args():
+    """Split the cluster options from the optional token and --auto-update"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--clusters', type=int, default=CLUSTER_COUNT)
+    parser.add_argument('--shards', type=int, default=None)
+    parser.add_argument('--dev-guild', type=int, default=DEV_GUILD_ID)
+    parser.add_argument('--sync', action='store_true')  # Sync commands even if they look unchanged
+    options, remaining = parser.parse_known_args()
+    options.token = next((arg for arg in remaining if not arg.startswith('--')), None)
+    return options
 
 def run_bot():
     # Create data directory if it doesn't exist
     os.makedirs('data', exist_ok=True)
-    
-    # Initialize the bot
-    bot = MusicBot()
+    options = parse_args()
     
     print("=== XNull Music Bot ===")
     print(f"\nCurrent Version: {CURRENT_VERSION}")
@@ -225,8 +313,8 @@ def run_bot():
     print("========================")
     
     # Get bot token
-    if len(sys.argv) > 1:
-        bot_token = sys.argv[1]
+    if options.token:
+        bot_token = options.token
     else:
         print("\nTo get your bot token:")
         print("1. Go to https://discord.com/developers/applications")
@@ -243,12 +331,19 @@ def run_bot():
     
     # Run the bot
     try:
+        if options.clusters != 1:
+            print("\nStarting clusters...")
+            worker = functools.partial(run_cluster_worker, dev_guild_id=options.dev_guild, force_sync=options.sync)
+            ClusterLauncher(bot_token, worker, options.clusters, options.shards).run()
+            return
         print("\nStarting bot...")
-        bot.run(bot_token)
+        MusicBot(shard_count=options.shards, dev_guild_id=options.dev_guild, force_sync=options.sync).run(bot_token)
     except discord.LoginFailure:
         print("Error: Invalid bot token!")
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
+    # Required for process-based extraction workers in the frozen exe
+    multiprocessing.freeze_support()
     run_bot() 
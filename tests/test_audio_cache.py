@@ -0,0 +1,37 @@
+import os
+from utils.audio_cache import AudioCache
+
+def add_file(cache, video_id, size):
+    with open(cache.file_path(video_id), 'wb') as f:
+        f.write(b'\0' * size)
+    cache.entries[video_id] = {'size': size, 'sha256': ''}
+    cache.total_bytes += size
+
+def test_files_in_use_stay_counted_until_deleted(tmp_path, monkeypatch):
+    cache = AudioCache(path=str(tmp_path), max_bytes=250)
+    for video_id in ('a', 'b', 'c'):
+        add_file(cache, video_id, 100)
+
+    # Windows refuses to delete a file FFmpeg still has open
+    remove = os.remove
+    def locked_remove(path):
+        if path == cache.file_path('a'):
+            raise PermissionError(13, 'in use', path)
+        remove(path)
+    monkeypatch.setattr(os, 'remove', locked_remove)
+
+    cache.evict()
+    assert list(cache.entries) == ['c']
+    assert cache.undeleted == {'a': 100}
+    assert cache.total_bytes == 200
+
+    cache.save()
+    restored = AudioCache(path=str(tmp_path), max_bytes=250)
+    assert restored.undeleted == {'a': 100}
+    assert restored.total_bytes == 200
+
+    monkeypatch.setattr(os, 'remove', remove)
+    restored.evict()
+    assert restored.undeleted == {}
+    assert restored.total_bytes == 100
+    assert not os.path.exists(restored.file_path('a'))
@@ -0,0 +1,62 @@
+import discord
+from utils.audio_pipeline import GaplessSource, FRAME_SECONDS, FRAME_SIZE
+
+class FakeSource(discord.AudioSource):
+    """PCM source that plays a fixed number of seconds"""
+
+    def __init__(self, seconds, opus=False):
+        self.frames_left = round(seconds / FRAME_SECONDS)
+        self.opus = opus
+        self.cleaned_up = False
+
+    def read(self):
+        if self.frames_left <= 0:
+            return b''
+        self.frames_left -= 1
+        return b'\1' * FRAME_SIZE
+
+    def is_opus(self):
+        return self.opus
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+def play_out(source):
+    while source.read():
+        pass
+
+def test_crossfade_counts_frames_mixed_into_next_track():
+    premature = []
+    transitions = []
+    source = GaplessSource(
+        FakeSource(30), duration=30, crossfade_seconds=10,
+        on_transition=transitions.append, on_premature_end=lambda position: premature.append(position) or False
+    )
+    source.set_next(FakeSource(60), {'duration': 60})
+
+    play_out(source)
+
+    assert len(transitions) == 1
+    assert premature == []
+    assert abs(source.position - 60) < FRAME_SECONDS
+
+def test_position_after_crossfade_matches_played_audio():
+    source = GaplessSource(FakeSource(20), duration=20, crossfade_seconds=5)
+    source.set_next(FakeSource(40), {'duration': 40})
+
+    # Play the first track and 10 seconds of the second
+    for _ in range(round(30 / FRAME_SECONDS)):
+        assert source.read()
+
+    # 5 seconds were mixed into the end of the first track
+    assert abs(source.position - 15) < FRAME_SECONDS
+
+def test_next_source_of_other_type_is_dropped():
+    source = GaplessSource(FakeSource(10, opus=True), duration=10)
+    upcoming = FakeSource(10)
+
+    source.set_next(upcoming, {'duration': 10})
+
+    assert source.next_source is None
+    assert upcoming.cleaned_up
+    assert source.is_opus()
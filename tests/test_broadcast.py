@@ -0,0 +1,13 @@
+from utils.broadcast import Broadcast
+
+def test_broadcast_that_ran_out_of_tracks_ends_new_listeners():
+    broadcast = Broadcast('radio', next_source=lambda: None)
+    first = broadcast.subscribe()
+    broadcast.join(5)
+
+    assert broadcast.stopped.is_set()
+    assert first.read() == b''
+    # Joining again must not start the finished thread a second time
+    late = broadcast.subscribe()
+    assert late.read() == b''
+    assert broadcast.listener_count() == 1
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+import pytest
+import utils.extractor as extractor
+from utils.extractor import ExtractionService, ExtractionError, ExtractionQueueFull, TrackUnavailable, wrap_error
+from utils.track import Track
+
+class SlowYoutubeDL:
+    """Stands in for yt-dlp, holding the first call so others coalesce onto it"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def extract_info(self, query, download=False):
+        self.calls += 1
+        self.release.wait(5)
+        return {'entries': [{'id': 'dQw4w9WgXcQ', 'title': 'Song', 'duration': 212}]}
+
+def test_coalesced_callers_each_get_their_own_tracks(monkeypatch):
+    ydl = SlowYoutubeDL()
+    monkeypatch.setattr(extractor, 'get_worker_ydl', lambda ydl_opts: ydl)
+
+    async def run():
+        service = ExtractionService({}, workers=2)
+        try:
+            requests = [asyncio.ensure_future(service.extract_tracks('ytsearch:foo')) for _ in range(3)]
+            await asyncio.sleep(0.1)
+            ydl.release.set()
+            return await asyncio.gather(*requests), service.stats()
+        finally:
+            service.shutdown()
+
+    results, stats = asyncio.run(run())
+
+    assert ydl.calls == 1
+    assert stats['coalesced'] == 2
+    tracks = [result['tracks'][0] for result in results]
+    assert all(isinstance(track, Track) and track.video_id == 'dQw4w9WgXcQ' for track in tracks)
+    # Queues must never share track objects
+    assert len({id(track) for track in tracks}) == 3
+
+class LazyPlaylistYoutubeDL:
+    """Stands in for yt-dlp, serving a playlist whose entries are produced lazily"""
+
+    instances = []
+
+    def __init__(self, ydl_opts):
+        self.size = ydl_opts['playlist_size']
+        self.delay = ydl_opts.get('entry_delay', 0)
+        self.produced = 0
+        self.calls = 0
+        LazyPlaylistYoutubeDL.instances.append(self)
+
+    def entries(self):
+        for index in range(self.size):
+            self.produced += 1
+            time.sleep(self.delay)
+            yield {'id': f'v{index:010d}', 'title': f'Song {index}', 'duration': 200}
+
+    def extract_info(self, query, download=False, process=True, ie_key=None):
+        self.calls += 1
+        if 'watch?v=' in query:
+            return {'_type': 'url', 'url': 'https://www.youtube.com/playlist?list=PL1', 'ie_key': 'YoutubeTab'}
+        return {'_type': 'playlist', 'title': 'Mix', 'entries': self.entries()}
+
+def collect_playlist(monkeypatch, size, query, stop_after=None):
+    LazyPlaylistYoutubeDL.instances.clear()
+    monkeypatch.setattr(extractor.yt_dlp, 'YoutubeDL', LazyPlaylistYoutubeDL)
+
+    async def run():
+        service = ExtractionService({'playlist_size': size}, workers=2)
+        try:
+            batches = []
+            stream = service.stream_playlist(query, 100, 400)
+            async for batch in stream:
+                batches.append(batch)
+                if stop_after and len(batches) == stop_after:
+                    break
+            await stream.aclose()
+            return batches
+        finally:
+            service.shutdown()
+
+    return asyncio.run(run()), LazyPlaylistYoutubeDL.instances[0]
+
+def test_playlist_is_walked_once_in_growing_batches(monkeypatch):
+    batches, ydl = collect_playlist(monkeypatch, 1050, 'https://www.youtube.com/watch?v=abc&list=PL1')
+
+    assert [len(batch['tracks']) for batch in batches] == [100, 200, 400, 350]
+    assert all(batch['playlist_title'] == 'Mix' for batch in batches)
+    tracks = [track for batch in batches for track in batch['tracks']]
+    assert [track.video_id for track in tracks] == [f'v{index:010d}' for index in range(1050)]
+    # One lookup for the watch URL, one for the playlist it points at, every entry read once
+    assert ydl.calls == 2
+    assert ydl.produced == 1050
+
+def test_playlist_walk_stops_when_the_caller_does(monkeypatch):
+    batches, ydl = collect_playlist(monkeypatch, 100000, 'https://www.youtube.com/playlist?list=PL1', stop_after=1)
+
+    assert len(batches[0]['tracks']) == 100
+    assert ydl.produced < 100000
+
+def test_only_videos_that_are_gone_count_as_unavailable():
+    assert isinstance(wrap_error(Exception("ERROR: [youtube] abc: Private video. Sign in if you've been granted access")), TrackUnavailable)
+    assert isinstance(wrap_error(Exception("ERROR: [youtube] abc: Video unavailable. This video has been removed by the uploader")), TrackUnavailable)
+
+    for message in ("ERROR: Unable to download webpage: HTTP Error 429: Too Many Requests", "ERROR: Read timed out"):
+        error = wrap_error(Exception(message))
+        assert isinstance(error, ExtractionError) and not isinstance(error, TrackUnavailable)
+
+def test_second_caller_joins_the_running_playlist_walk(monkeypatch):
+    LazyPlaylistYoutubeDL.instances.clear()
+    monkeypatch.setattr(extractor.yt_dlp, 'YoutubeDL', LazyPlaylistYoutubeDL)
+
+    async def collect(stream, results, first_batch=None):
+        async for batch in stream:
+            results.extend(batch['tracks'])
+            if first_batch and not first_batch.is_set():
+                first_batch.set()
+
+    async def run():
+        service = ExtractionService({'playlist_size': 700, 'entry_delay': 0.0005}, workers=2)
+        try:
+            first, second = [], []
+            started = asyncio.Event()
+            leader = asyncio.ensure_future(collect(service.stream_playlist('PL1', 100, 400), first, started))
+            await started.wait()
+            # Joins after the first batch was emitted, so that one is replayed
+            await collect(service.stream_playlist('PL1', 100, 400), second)
+            await leader
+            return first, second, service.stats()
+        finally:
+            service.shutdown()
+
+    first, second, stats = asyncio.run(run())
+
+    assert len(LazyPlaylistYoutubeDL.instances) == 1
+    assert stats['coalesced'] == 1
+    assert [track.video_id for track in first] == [track.video_id for track in second]
+    assert len(first) == 700
+    # Each caller gets its own tracks
+    assert first[0] is not second[0]
+
+def test_playlist_walks_past_the_worker_limit_are_rejected(monkeypatch):
+    monkeypatch.setattr(extractor.yt_dlp, 'YoutubeDL', LazyPlaylistYoutubeDL)
+
+    async def run():
+        service = ExtractionService({'playlist_size': 100000, 'entry_delay': 0.001}, workers=1, queue_timeout=0.1)
+        try:
+            busy = service.stream_playlist('PL1', 100, 400)
+            await busy.__anext__()
+            with pytest.raises(ExtractionQueueFull):
+                await service.stream_playlist('PL2', 100, 400).__anext__()
+            await busy.aclose()
+        finally:
+            service.shutdown()
+
+    asyncio.run(run())
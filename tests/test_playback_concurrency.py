@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import discord
+from cogs.music import Music
+from utils.guild_player import GuildPlayer
+from utils.track import Track
+from tests.test_audio_pipeline import FakeSource
+
+TRACK_SECONDS = 0.3  # 15 frames, read a frame per millisecond so tracks keep transitioning under the commands
+
+class TrackSource(FakeSource):
+    """Fake FFmpeg output that remembers which track it plays"""
+
+    def __init__(self, track):
+        super().__init__(TRACK_SECONDS)
+        self.track = track
+
+class FakeVoiceClient:
+    """Plays sources on a thread like discord.py's AudioPlayer, only faster"""
+
+    def __init__(self):
+        self.source = None
+        self.thread = None
+        self.stopping = None
+        self.paused = threading.Event()
+        self.lock = threading.Lock()
+        self.reading = 0  # Threads still reading a source
+        self.most_reading = 0
+
+    def play(self, source, after=None):
+        if self.is_playing():
+            raise discord.ClientException("Already playing audio.")
+        self.source = source
+        self.stopping = stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(source, after, stopping), daemon=True)
+        self.thread.start()
+
+    def run(self, source, after, stopping):
+        with self.lock:
+            self.reading += 1
+            self.most_reading = max(self.most_reading, self.reading)
+        while not stopping.is_set():
+            if self.paused.is_set():
+                time.sleep(0.001)
+                continue
+            if not source.read():
+                break
+            time.sleep(0.001)
+        stopping.set()
+        with self.lock:
+            self.reading -= 1
+        after(None)
+        source.cleanup()
+
+    def is_playing(self):
+        return self.stopping is not None and not self.stopping.is_set()
+
+    def is_paused(self):
+        return False
+
+    def stop(self):
+        if self.stopping:
+            self.stopping.set()
+
+class FakeGuild:
+    def __init__(self, guild_id, voice_client):
+        self.id = guild_id
+        self.voice_client = voice_client
+
+class FakeResponse:
+    async def send_message(self, *args, **kwargs):
+        await asyncio.sleep(0.001)  # Commands hold the lock across the reply
+
+class FakeInteraction:
+    def __init__(self, guild):
+        self.guild = guild
+        self.channel = None
+        self.response = FakeResponse()
+
+class FakeStore:
+    def save(self, player):
+        pass
+
+class FakeBot:
+    def __init__(self):
+        self.players = {}
+        self.store = FakeStore()
+        self.loop = None
+        self.cluster = None
+
+    def get_player(self, guild_id):
+        player = self.players.get(guild_id)
+        if player is None:
+            player = self.players[guild_id] = GuildPlayer(guild_id)
+        return player
+
+def make_cog(bot, sources):
+    cog = Music(bot)
+
+    async def resolve_stream(track):
+        await asyncio.sleep(0.002)
+        return {'url': f'fake://{track.video_id}', 'duration': TRACK_SECONDS}
+
+    def create_audio_source(guild, track, stream, force_pcm=False, start_at=0, opus=None):
+        source = TrackSource(track)
+        sources.append(source)
+        return source
+
+    cog.resolve_stream = resolve_stream
+    cog.create_audio_source = create_audio_source
+    cog.schedule_validation = lambda player: None
+    return cog
+
+def test_rapid_skips_keep_queue_state_on_the_playing_track(caplog):
+    random.seed(20)
+    sources = []
+
+    async def run():
+        bot = FakeBot()
+        bot.loop = asyncio.get_running_loop()
+        cog = make_cog(bot, sources)
+        voice_client = FakeVoiceClient()
+        guild = FakeGuild(1, voice_client)
+        player = bot.get_player(guild.id)
+        player.repeat_mode = 'all'
+        player.queue.extend(
+            [Track.from_dict({'url': f'https://www.youtube.com/watch?v=v{index:010d}', 'title': f'Song {index}'}) for index in range(8)]
+        )
+        try:
+            await cog.play_if_idle(guild)
+            interaction = FakeInteraction(guild)
+            for _ in range(300):
+                command = cog.next if random.random() < 0.6 else cog.previous
+                await command.callback(cog, interaction)
+                await asyncio.sleep(random.random() * 0.01)
+
+            # Let pending transitions commit, then check state while the audio thread holds still
+            voice_client.paused.set()
+            await asyncio.sleep(0.1)
+            async with player.lock:
+                return player, voice_client
+        finally:
+            cog.extractor.shutdown()
+
+    with caplog.at_level(logging.WARNING):
+        player, voice_client = asyncio.run(run())
+
+    assert voice_client.most_reading == 1
+    assert player.gapless_source is voice_client.source
+    playing = player.gapless_source.source.track
+    assert player.now_playing is playing
+    assert player.queue[player.position] is playing
+    # Every FFmpeg stand-in except the playing one and a pre-spawned next one was released
+    live = [source for source in sources if not source.cleaned_up]
+    assert len(live) <= 2 and player.gapless_source.source in live
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+
+def test_transition_of_a_detached_source_leaves_state_alone():
+    sources = []
+
+    async def run():
+        bot = FakeBot()
+        bot.loop = asyncio.get_running_loop()
+        cog = make_cog(bot, sources)
+        guild = FakeGuild(1, FakeVoiceClient())
+        player = bot.get_player(guild.id)
+        tracks = [Track.from_dict({'url': f'https://www.youtube.com/watch?v=v{index:010d}', 'title': f'Song {index}'}) for index in range(3)]
+        player.queue.extend(tracks)
+        try:
+            source = object()
+            player.gapless_source = source
+            meta = {'position': 1, 'track': tracks[1], 'stream': {'url': 'fake://1'}}
+
+            # A command holds the lock, so the swap is committed once it lets go
+            async with player.lock:
+                transition = asyncio.ensure_future(cog.track_transitioned(guild, source, meta))
+                await asyncio.sleep(0.01)
+                assert player.position == 0
+                # The command stopped the source and moved on to another track
+                player.gapless_source = None
+                player.position = 2
+                player.now_playing = tracks[2]
+            await transition
+            return player, tracks
+        finally:
+            cog.extractor.shutdown()
+
+    player, tracks = asyncio.run(run())
+
+    assert player.position == 2
+    assert player.now_playing is tracks[2]
@@ -0,0 +1,128 @@
+import random
+from array import array
+from utils.track import Track, TrackQueue
+
+WORDS = ['love', 'night', 'live', 'remix', 'lofi', 'beats', 'summer', 'official']
+
+def make_track(number, rng):
+    # Few distinct IDs so the queue holds duplicates
+    video_id = f"v{rng.randrange(40):010d}"
+    title = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {number}"
+    return Track(video_id, title, 60, added_by=rng.choice([1, 2, 3]))
+
+class FakeStore:
+    """Writes rows the way the player store does, only the new tail unless the queue asks for a rewrite"""
+
+    def __init__(self):
+        self.rows = []
+
+    def write(self, queue):
+        start = queue.persisted if queue.persisted <= len(queue) else 0
+        self.rows[start:] = queue.stored_tracks(start)
+        queue.persisted = len(queue)
+        restored = TrackQueue(self.rows)
+        order = queue.stored_order()
+        if order is not None:
+            restored.order = array('I', order)
+            restored.shuffled = True
+        return restored
+
+def check(queue, model, store):
+    assert list(store.write(queue)) == model
+    assert list(queue) == model
+    assert len(queue) == len(model)
+    assert queue.total_duration == sum(track.duration for track in model)
+
+    seen = set()
+    expected_duplicates = []
+    for position, track in enumerate(model):
+        if track.video_id in seen:
+            expected_duplicates.append(position)
+        seen.add(track.video_id)
+    assert queue.duplicates() == expected_duplicates
+
+    for user_id in (1, 2, 3):
+        assert queue.queued_by(user_id) == [position for position, track in enumerate(model) if track.added_by == user_id]
+
+    for word in ('lo', 'night', 'remix 1', 'love 12'):
+        terms = word.split()
+        expected = [
+            position for position, track in enumerate(model)
+            if all(any(title_word == term or (len(term) > 1 and title_word.startswith(term)) for title_word in track.title.split()) for term in terms)
+        ]
+        assert queue.search(word, limit=1000) == expected
+
+def test_queue_lookups_follow_removals_moves_and_shuffles():
+    rng = random.Random(23)
+    queue = TrackQueue()
+    model = []
+    number = 0
+    store = FakeStore()
+
+    for step in range(400):
+        action = rng.random()
+        if action < 0.3 or len(model) < 5:
+            tracks = [make_track(number + offset, rng) for offset in range(rng.randint(1, 20))]
+            number += len(tracks)
+            queue.extend(tracks)
+            model.extend(tracks)
+        elif action < 0.45:
+            start = rng.randrange(len(model))
+            stop = min(len(model), start + rng.randint(1, 5))
+            assert queue.remove(start, stop) == model[start:stop]
+            del model[start:stop]
+        elif action < 0.55:
+            positions = sorted(rng.sample(range(len(model)), rng.randint(1, len(model) // 3 + 1)))
+            assert queue.remove_positions(positions) == [model[position] for position in positions]
+            model = [track for position, track in enumerate(model) if position not in set(positions)]
+        elif action < 0.7:
+            source, destination = rng.randrange(len(model)), rng.randrange(len(model))
+            queue.move(source, destination)
+            model.insert(destination, model.pop(source))
+        elif action < 0.78:
+            queue.shuffle()
+            model = list(queue)
+        elif action < 0.85:
+            queue.unshuffle()
+            model = list(queue)
+        elif action < 0.92:
+            # The player store compacts before every write
+            queue.compact()
+        else:
+            positions = queue.duplicates()
+            queue.remove_positions(positions)
+            model = [track for position, track in enumerate(model) if position not in set(positions)]
+
+        check(queue, model, store)
+
+def test_unshuffle_returns_to_the_added_order_after_moves():
+    tracks = [Track(f"v{number:010d}", f"Song {number}") for number in range(5)]
+    queue = TrackQueue(tracks)
+    queue.move(4, 0)
+    queue.remove(2)
+    queue.shuffle()
+    queue.unshuffle()
+
+    assert list(queue) == [tracks[4], tracks[0], tracks[2], tracks[3]]
+
+def test_removals_keep_the_title_index():
+    queue = TrackQueue(Track(f"v{number:010d}", f"Song {number}") for number in range(100))
+    assert queue.search('song 42') == [42]
+    index = queue.index
+
+    queue.remove(0, 10)
+    queue.remove_positions([0, 5])
+    queue.move(0, 50)
+    queue.compact()
+
+    assert queue.index is index
+    assert queue.search('song 42') == [29]
+
+def test_common_prefixes_return_the_first_matches_in_play_order():
+    queue = TrackQueue(Track(f"v{number:010d}", f"{WORDS[number % 4]} {number}") for number in range(5000))
+    queue.remove(0)
+
+    assert queue.search('lo', limit=3) == [3, 7, 11]
+    assert queue.search('l', limit=3) == []
+    assert queue.search('live 1', limit=3) == []
+    assert queue.search('live 10', limit=3) == [9, 101, 105]
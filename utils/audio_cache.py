@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from utils.paths import get_data_path
+from utils.ffmpeg_supervisor import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+def hash_file(path):
+    """Get the SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class AudioCache:
+    """Size-bounded LRU cache of Opus/webm audio files for frequently played tracks"""
+
+    def __init__(self, path=None, max_bytes=2 * 1024 ** 3, max_duration=900, executable='ffmpeg', concurrency=2, supervisor=None):
+        self.path = path or get_data_path('audio_cache')
+        self.index_path = os.path.join(self.path, 'index.json')
+        self.max_bytes = max_bytes
+        self.max_duration = max_duration  # Longer tracks (mixes, podcasts) are streamed only
+        self.executable = executable
+        self.supervisor = supervisor  # FFmpegSupervisor that owns download processes
+        self.entries = OrderedDict()  # Video ID -> {'size', 'sha256'}, least recently used first
+        self.total_bytes = 0  # Includes removed files that could not be deleted yet
+        self.undeleted = {}  # Video ID -> Size of a removed file still on disk, deletion is retried
+        self.verified = set()  # Video IDs whose checksum was checked this run
+        self.downloads = {}  # Video ID -> Running download task
+        self.slots = asyncio.Semaphore(concurrency)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self.load()
+
+    def file_path(self, video_id):
+        return os.path.join(self.path, f"{video_id}.webm")
+
+    def load(self):
+        """Load the cache index, dropping entries whose files are missing or truncated"""
+        os.makedirs(self.path, exist_ok=True)
+        if not os.path.exists(self.index_path):
+            return
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading audio cache index: {e}")
+            return
+
+        for video_id, entry in data.get('entries', []):
+            path = self.file_path(video_id)
+            if os.path.exists(path) and os.path.getsize(path) == entry['size']:
+                self.entries[video_id] = entry
+                self.total_bytes += entry['size']
+        for video_id, size in data.get('undeleted', []):
+            self.undeleted[video_id] = size
+            self.total_bytes += size
+        self.retry_deletes()
+
+    def save(self):
+        """Write the cache index to disk"""
+        data = {'entries': list(self.entries.items()), 'undeleted': list(self.undeleted.items())}
+        try:
+            temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"Error saving audio cache index: {e}")
+
+    def delete_file(self, video_id):
+        """Delete a cached file, a missing file counts as deleted"""
+        try:
+            os.remove(self.file_path(video_id))
+        except FileNotFoundError:
+            pass
+
+    def remove(self, video_id):
+        """Drop a cached file, its size stays counted until the file is actually deleted"""
+        entry = self.entries.pop(video_id, None)
+        self.verified.discard(video_id)
+        size = entry['size'] if entry else 0
+        try:
+            self.delete_file(video_id)
+        except OSError as e:
+            # Windows refuses to delete a file FFmpeg still has open
+            logger.warning(f"Could not remove cached audio {video_id}, will retry: {e}")
+            self.undeleted[video_id] = self.undeleted.get(video_id, 0) + size
+            return
+        self.total_bytes -= size
+
+    def retry_deletes(self):
+        """Delete removed files that were still in use"""
+        for video_id, size in list(self.undeleted.items()):
+            try:
+                self.delete_file(video_id)
+            except OSError as e:
+                logger.debug(f"Cached audio {video_id} still can't be removed: {e}")
+                continue
+            del self.undeleted[video_id]
+            self.total_bytes -= size
+
+    async def get(self, video_id):
+        """Return the local file for a track if it is cached and intact"""
+        entry = self.entries.get(video_id) if video_id else None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        path = self.file_path(video_id)
+        try:
+            intact = os.path.getsize(path) == entry['size']
+            # Check the full checksum the first time a file is served after startup
+            if intact and video_id not in self.verified:
+                checksum = await asyncio.get_event_loop().run_in_executor(None, hash_file, path)
+                intact = checksum == entry['sha256']
+                self.verified.add(video_id)
+        except OSError:
+            intact = False
+
+        if not intact:
+            logger.warning(f"Cached audio for {video_id} failed integrity check, removing it")
+            self.remove(video_id)
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(video_id)
+        self.hits += 1
+        self.bytes_served += entry['size']
+        return path
+
+    def schedule_download(self, video_id, stream, duration=0):
+        """Store a track's audio in the background after it was streamed"""
+        if not video_id or video_id in self.entries or video_id in self.downloads:
+            return
+        if duration and duration > self.max_duration:
+            return
+
+        self.downloads[video_id] = asyncio.create_task(self.download(video_id, stream))
+
+    async def download(self, video_id, stream):
+        """Copy (or transcode) a stream into the cache as Opus/webm"""
+        final_path = self.file_path(video_id)
+        temp_path = f"{final_path}.{os.getpid()}.part"
+        is_opus = stream.get('acodec') == 'opus'
+        codec_args = ['-c:a', 'copy'] if is_opus else ['-c:a', 'libopus', '-b:a', '128k']
+
+        try:
+            async with self.slots:
+                if self.supervisor:
+                    self.supervisor.ensure_capacity(PRIORITY_BACKGROUND)
+                process = await asyncio.create_subprocess_exec(
+                    self.executable, '-y', '-loglevel', 'error',
+                    '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+                    '-i', stream['url'],
+                    '-vn', *codec_args, '-f', 'webm', temp_path,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                if self.supervisor:
+                    self.supervisor.register(process, kind='cache', priority=PRIORITY_BACKGROUND)
+                try:
+                    _, stderr = await process.communicate()
+                except asyncio.CancelledError:
+                    process.kill()
+                    raise
+
+            if process.returncode != 0 or not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+                raise Exception(stderr.decode('utf-8', 'ignore').strip() or f"FFmpeg exited with {process.returncode}")
+
+            size = os.path.getsize(temp_path)
+            checksum = await asyncio.get_event_loop().run_in_executor(None, hash_file, temp_path)
+            os.replace(temp_path, final_path)
+            # Replacing the file also got rid of an old copy that couldn't be deleted
+            self.total_bytes -= self.undeleted.pop(video_id, 0)
+
+            self.entries[video_id] = {'size': size, 'sha256': checksum, 'stored_at': time.time()}
+            self.verified.add(video_id)
+            self.total_bytes += size
+            self.evict()
+            await asyncio.get_event_loop().run_in_executor(None, self.save)
+            logger.debug(f"Cached audio for {video_id} ({size} bytes)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Failed to cache audio for {video_id}: {e}")
+        finally:
+            self.downloads.pop(video_id, None)
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def evict(self):
+        """Remove least recently used files until the cache fits its byte cap"""
+        self.retry_deletes()
+        while self.total_bytes > self.max_bytes and self.entries:
+            video_id = next(iter(self.entries))
+            self.remove(video_id)
+
+    def stats(self):
+        """Get hit rate and bytes served from disk"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'bytes_served': self.bytes_served,
+            'size_bytes': self.total_bytes,
+            'files': len(self.entries)
+        }
+
+    def shutdown(self):
+        """Cancel running downloads and persist the index"""
+        for task in self.downloads.values():
+            task.cancel()
+        self.save()
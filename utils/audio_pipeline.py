@@ -0,0 +1,200 @@
+import time
+import logging
+import threading
+from array import array
+import discord
+
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = discord.opus.Encoder.FRAME_LENGTH / 1000  # 20 ms per read
+FRAME_SIZE = discord.opus.Encoder.FRAME_SIZE  # Bytes of 16-bit stereo PCM per frame
+PCM_SILENCE = b'\0' * FRAME_SIZE
+OPUS_SILENCE = b'\xf8\xff\xfe'
+
+def mix_frames(current, upcoming, progress):
+    """Mix two PCM frames, fading current out and upcoming in"""
+    a = array('h', current.ljust(FRAME_SIZE, b'\0'))
+    b = array('h', upcoming.ljust(FRAME_SIZE, b'\0'))
+    fade_out = 1.0 - progress
+    mixed = array('h', (max(-32768, min(32767, int(x * fade_out + y * progress))) for x, y in zip(a, b)))
+    return mixed.tobytes()
+
+class GaplessSource(discord.AudioSource):
+    """Audio source that swaps to a pre-spawned next source without a gap, with optional crossfade"""
+
+    def __init__(self, source, duration=0, prespawn_seconds=10, crossfade_seconds=0,
+                 on_near_end=None, on_transition=None, on_gap=None, gap_start=None, start_offset=0,
+                 on_premature_end=None, premature_tolerance=5, recovery_timeout=20):
+        self.source = source
+        # discord.py only creates an Opus encoder when play() starts on PCM, so the output type can never change
+        self.opus = source.is_opus()
+        self.duration = duration or 0
+        self.start_offset = start_offset or 0  # Seconds into the track the current source started at
+        self.prespawn_seconds = prespawn_seconds
+        self.crossfade_seconds = crossfade_seconds
+        self.on_near_end = on_near_end  # Called once when the next source should be spawned
+        self.on_transition = on_transition  # Called with the next source's metadata after a swap
+        self.on_gap = on_gap  # Called with the silence before the first frame of a source
+        self.gap_start = gap_start
+        self.on_premature_end = on_premature_end  # Called with the position when a stream dies early
+        self.premature_tolerance = premature_tolerance
+        self.recovery_timeout = recovery_timeout
+        self.recovering_since = None
+        self.frames = 0
+        self.near_end_notified = False
+        self.next_source = None
+        self.next_meta = None
+        self.next_frames = 0  # Frames of the next source already mixed in by the crossfade
+        self.lock = threading.Lock()
+        # Held by the audio thread while reading so the current source can be replaced safely
+        self.source_lock = threading.RLock()
+
+    @property
+    def elapsed(self):
+        """Seconds of the current source played so far"""
+        return self.frames * FRAME_SECONDS
+
+    @property
+    def position(self):
+        """Playback position within the current track in seconds"""
+        return self.start_offset + self.elapsed
+
+    def replace_current(self, source, start_offset=0):
+        """Swap the current source for one of the same track, e.g. after a seek"""
+        if source.is_opus() != self.opus:
+            source.cleanup()
+            raise ValueError("Replacement source must match the playing output type")
+        with self.source_lock:
+            previous = self.source
+            self.source = source
+            self.start_offset = start_offset
+            self.frames = 0
+            self.near_end_notified = False
+            self.recovering_since = None
+        previous.cleanup()
+
+    def abort_recovery(self):
+        """Give up on a dead stream so the track ends normally"""
+        self.recovering_since = 0.0
+
+    def ended_early(self):
+        """Check if the current source stopped well before the track's duration"""
+        return bool(self.duration) and self.position < self.duration - self.premature_tolerance
+
+    def set_next(self, source, meta):
+        """Attach a pre-spawned source to play when the current one ends"""
+        if source.is_opus() != self.opus:
+            # The next track will start a new player instead
+            logger.warning("Pre-spawned source does not match the playing output type, dropping it")
+            source.cleanup()
+            return
+        with self.lock:
+            previous = self.next_source
+            self.next_source = source
+            self.next_meta = meta
+            self.next_frames = 0
+        if previous:
+            previous.cleanup()
+
+    def clear_next(self):
+        """Drop the pre-spawned source, e.g. after the queue changed"""
+        with self.lock:
+            previous = self.next_source
+            self.next_source = None
+            self.next_meta = None
+            self.next_frames = 0
+            # Ask for a new next source if we are already close to the end
+            self.near_end_notified = False
+        if previous:
+            previous.cleanup()
+
+    def is_opus(self):
+        return self.opus
+
+    def crossfade_progress(self):
+        """Return how far into the crossfade window we are, or None outside it"""
+        if not self.crossfade_seconds or not self.duration or self.opus:
+            return None
+        remaining = self.duration - self.position
+        if remaining > self.crossfade_seconds:
+            return None
+        return min(1.0, max(0.0, 1.0 - remaining / self.crossfade_seconds))
+
+    def read(self):
+        with self.source_lock:
+            return self.read_frame()
+
+    def read_frame(self):
+        data = self.source.read()
+
+        if data:
+            self.frames += 1
+            if self.gap_start is not None:
+                self.report_gap()
+
+            if (not self.near_end_notified and self.duration and self.on_near_end
+                    and self.position >= self.duration - self.prespawn_seconds - self.crossfade_seconds):
+                self.near_end_notified = True
+                self.on_near_end()
+
+            progress = self.crossfade_progress()
+            if progress is not None:
+                with self.lock:
+                    upcoming = self.next_source
+                if upcoming and not upcoming.is_opus():
+                    head = upcoming.read()
+                    if head:
+                        self.next_frames += 1
+                        data = mix_frames(data, head, progress)
+            return data
+
+        # The stream died before the end of the track, keep the player alive while it is recovered
+        if self.recovering_since is None and self.on_premature_end and self.ended_early():
+            if self.on_premature_end(self.position):
+                self.recovering_since = time.monotonic()
+        if self.recovering_since and time.monotonic() - self.recovering_since < self.recovery_timeout:
+            return OPUS_SILENCE if self.opus else PCM_SILENCE
+
+        # Current source ended, swap to the pre-spawned one if we have it
+        with self.lock:
+            upcoming, meta = self.next_source, self.next_meta
+            # The crossfade already played the start of the next track
+            consumed = self.next_frames
+            self.next_source = None
+            self.next_meta = None
+            self.next_frames = 0
+
+        ended = self.source
+        ended.cleanup()
+        if not upcoming:
+            return b''
+
+        self.source = upcoming
+        self.duration = meta.get('duration', 0) or 0
+        self.start_offset = 0
+        self.frames = consumed
+        self.near_end_notified = False
+        self.recovering_since = None
+        self.gap_start = time.monotonic()
+
+        if self.on_transition:
+            self.on_transition(meta)
+
+        return self.read_frame()
+
+    def report_gap(self):
+        """Report the silence between the end of the previous source and this first frame"""
+        gap = time.monotonic() - self.gap_start
+        self.gap_start = None
+        if self.on_gap:
+            self.on_gap(gap)
+
+    def cleanup(self):
+        with self.source_lock:
+            self.source.cleanup()
+        with self.lock:
+            upcoming = self.next_source
+            self.next_source = None
+            self.next_meta = None
+        if upcoming:
+            upcoming.cleanup()
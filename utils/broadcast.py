@@ -0,0 +1,138 @@
+import time
+import logging
+import threading
+from collections import deque
+import discord
+from utils.audio_pipeline import OPUS_SILENCE
+
+logger = logging.getLogger(__name__)
+
+FRAME_DELAY = discord.opus.Encoder.FRAME_LENGTH / 1000
+
+class BroadcastSubscriber(discord.AudioSource):
+    """Per-connection view of a broadcast with its own bounded packet buffer"""
+
+    def __init__(self, broadcast, max_frames=50):
+        self.broadcast = broadcast
+        # A full buffer drops the oldest packets, so a slow connection skips ahead instead of stalling others
+        self.frames = deque(maxlen=max_frames)
+        self.condition = threading.Condition()
+        self.ended = False
+        self.dropped = 0
+
+    def push(self, packet):
+        with self.condition:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(packet)
+            self.condition.notify()
+
+    def end(self):
+        with self.condition:
+            self.ended = True
+            self.condition.notify()
+
+    def is_opus(self):
+        return True
+
+    def read(self):
+        with self.condition:
+            if not self.frames and not self.ended:
+                self.condition.wait(FRAME_DELAY * 3)
+            if self.frames:
+                return self.frames.popleft()
+            if self.ended:
+                return b''
+        # Keep the connection paced while the broadcast is between tracks
+        return OPUS_SILENCE
+
+    def cleanup(self):
+        self.broadcast.unsubscribe(self)
+
+class Broadcast(threading.Thread):
+    """Reads one Opus source in real time and fans its packets out to every subscriber"""
+
+    def __init__(self, name, next_source, buffer_frames=50):
+        super().__init__(name=f"broadcast-{name}", daemon=True)
+        self.station = name
+        self.next_source = next_source  # Blocking callable returning the next Opus AudioSource, or None to end
+        self.buffer_frames = buffer_frames
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.source = None
+        self.packets = 0
+
+    def subscribe(self):
+        """Add a listener, starting the broadcast with the first one"""
+        subscriber = BroadcastSubscriber(self, max_frames=self.buffer_frames)
+        # Checked under the lock so run() either sees this subscriber or it sees stopped
+        with self.lock:
+            if self.stopped.is_set():
+                subscriber.end()
+                return subscriber
+            self.subscribers.add(subscriber)
+            if self.ident is None:  # Never started, a finished thread has stopped set
+                self.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Remove a listener, stopping the broadcast when nobody is left"""
+        with self.lock:
+            self.subscribers.discard(subscriber)
+            empty = not self.subscribers
+        if empty:
+            self.stop()
+
+    def listener_count(self):
+        with self.lock:
+            return len(self.subscribers)
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        try:
+            self.produce()
+        except Exception as e:
+            logger.error(f"Broadcast {self.station} failed: {e}", exc_info=True)
+        finally:
+            if self.source:
+                self.source.cleanup()
+                self.source = None
+            # The broadcast also ends when next_source runs out, a thread can't be started twice
+            with self.lock:
+                self.stopped.set()
+                subscribers = list(self.subscribers)
+            for subscriber in subscribers:
+                subscriber.end()
+
+    def produce(self):
+        start = time.perf_counter()
+        loops = 0
+
+        while not self.stopped.is_set():
+            if self.source is None:
+                self.source = self.next_source()
+                if self.source is None:
+                    return
+                # Restart the clock so time spent loading is not caught up in a burst
+                start = time.perf_counter()
+                loops = 0
+
+            packet = self.source.read()
+            if not packet:
+                self.source.cleanup()
+                self.source = None
+                continue
+
+            with self.lock:
+                subscribers = list(self.subscribers)
+            for subscriber in subscribers:
+                subscriber.push(packet)
+            self.packets += 1
+
+            loops += 1
+            delay = start + FRAME_DELAY * loops - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
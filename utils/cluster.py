@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import wait
+import discord
+import requests
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+STATUS_INTERVAL = 15  # Seconds between status reports from each cluster
+RESTART_DELAY = 5  # Seconds before a crashed cluster is started again
+STOP_TIMEOUT = 10  # Seconds a cluster gets to close cleanly on shutdown
+LOGIN_FAILED_EXIT = 2  # Exit code of a cluster whose token was rejected, nothing is restarted
+
+def recommended_shard_count(token):
+    """Ask Discord how many shards the bot should run"""
+    response = requests.get(GATEWAY_BOT_URL, headers={'Authorization': f'Bot {token}'}, timeout=10)
+    if response.status_code == 401:
+        raise discord.LoginFailure("Improper token has been passed.")
+    response.raise_for_status()
+    return response.json()['shards']
+
+def shard_ranges(shard_count, cluster_count):
+    """Split shard IDs into contiguous ranges, one per cluster"""
+    per_cluster, extra = divmod(shard_count, cluster_count)
+    ranges = []
+    start = 0
+    for cluster_id in range(cluster_count):
+        size = per_cluster + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+class Worker:
+    """A running cluster process and the launcher's end of its pipe"""
+
+    __slots__ = ('cluster_id', 'shard_ids', 'process', 'connection', 'restart_at')
+
+    def __init__(self, cluster_id, shard_ids):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.process = None
+        self.connection = None
+        self.restart_at = None  # Set while waiting to restart after a crash
+
+class ClusterLauncher:
+    """Runs shard ranges in worker processes and relays messages between them"""
+
+    def __init__(self, token, target, cluster_count=None, shard_count=None):
+        self.token = token
+        self.target = target  # Called in each worker as target(cluster_id, shard_ids, shard_count, token, connection)
+        self.cluster_count = cluster_count or multiprocessing.cpu_count()
+        self.shard_count = shard_count
+        self.workers = {}  # Cluster ID -> Worker
+        self.statuses = {}  # Cluster ID -> latest status report
+        self.presence = None  # Last /setstatus, so restarted clusters pick it up too
+        self.running = False
+
+    def run(self):
+        """Start every cluster and relay messages until they all exit"""
+        shard_count = self.shard_count or recommended_shard_count(self.token)
+        # Every cluster needs at least one shard
+        shard_count = max(shard_count, self.cluster_count)
+        logger.info(f"Starting {self.cluster_count} cluster(s) for {shard_count} shard(s)")
+
+        for cluster_id, shard_ids in enumerate(shard_ranges(shard_count, self.cluster_count)):
+            worker = self.workers[cluster_id] = Worker(cluster_id, shard_ids)
+            self.start_worker(worker, shard_count)
+
+        self.running = True
+        try:
+            while self.running and self.workers:
+                self.poll(shard_count)
+        except KeyboardInterrupt:
+            logger.info("Stopping clusters...")
+        finally:
+            self.stop()
+
+    def start_worker(self, worker, shard_count):
+        parent_end, child_end = multiprocessing.Pipe()
+        worker.process = multiprocessing.Process(
+            target=self.target,
+            args=(worker.cluster_id, worker.shard_ids, shard_count, self.token, child_end),
+            name=f"cluster-{worker.cluster_id}"
+        )
+        worker.process.start()
+        child_end.close()
+        worker.connection = parent_end
+        worker.restart_at = None
+        if self.presence:
+            self.send(worker, {'op': 'presence', 'status': self.presence})
+        logger.info(f"Cluster {worker.cluster_id} started with shards {worker.shard_ids[0]}-{worker.shard_ids[-1]}")
+
+    def poll(self, shard_count):
+        running = [worker for worker in self.workers.values() if worker.restart_at is None]
+        waitables = [worker.connection for worker in running] + [worker.process.sentinel for worker in running]
+        if not waitables:
+            time.sleep(1)  # Every cluster is waiting to restart
+        ready = set(wait(waitables, timeout=1)) if waitables else set()
+
+        for worker in running:
+            if worker.connection in ready:
+                try:
+                    while worker.connection.poll():
+                        self.handle(worker, worker.connection.recv())
+                except (EOFError, OSError):
+                    pass  # The process sentinel reports the exit
+            if worker.process.sentinel in ready:
+                self.worker_exited(worker)
+
+        now = time.monotonic()
+        for worker in list(self.workers.values()):
+            if worker.restart_at is not None and now >= worker.restart_at:
+                self.start_worker(worker, shard_count)
+
+    def worker_exited(self, worker):
+        worker.process.join()
+        worker.connection.close()
+        self.statuses.pop(worker.cluster_id, None)
+        exitcode = worker.process.exitcode
+
+        if exitcode == LOGIN_FAILED_EXIT:
+            logger.error("Bot token was rejected, stopping all clusters")
+            self.running = False
+            return
+        if exitcode == 0:
+            logger.info(f"Cluster {worker.cluster_id} exited")
+            del self.workers[worker.cluster_id]
+            return
+
+        logger.error(f"Cluster {worker.cluster_id} exited with code {exitcode}, restarting in {RESTART_DELAY}s")
+        worker.restart_at = time.monotonic() + RESTART_DELAY
+
+    def handle(self, worker, message):
+        op = message.get('op')
+        if op == 'status':
+            self.statuses[worker.cluster_id] = message['status']
+            self.broadcast({'op': 'statuses', 'statuses': self.statuses})
+        elif op == 'presence':
+            self.presence = message['status']
+            self.broadcast(message)
+        else:
+            logger.warning(f"Unknown message from cluster {worker.cluster_id}: {op}")
+
+    def broadcast(self, message):
+        for worker in self.workers.values():
+            if worker.restart_at is None:
+                self.send(worker, message)
+
+    @staticmethod
+    def send(worker, message):
+        try:
+            worker.connection.send(message)
+        except (BrokenPipeError, OSError) as e:
+            logger.debug(f"Could not reach cluster {worker.cluster_id}: {e}")
+
+    def stop(self):
+        """Give every cluster time to close, then kill the stragglers"""
+        for worker in self.workers.values():
+            if worker.process and worker.process.is_alive():
+                worker.process.join(timeout=STOP_TIMEOUT)
+                if worker.process.is_alive():
+                    logger.warning(f"Cluster {worker.cluster_id} did not stop, terminating it")
+                    worker.process.terminate()
+        self.workers.clear()
+
+class ClusterClient:
+    """A cluster's end of the pipe to the launcher"""
+
+    def __init__(self, cluster_id, connection):
+        self.cluster_id = cluster_id
+        self.connection = connection
+        self.statuses = {}  # Cluster ID -> latest status report, this cluster included
+        self.presence = None  # Last /setstatus, applied again whenever the shards become ready
+        self.bot = None
+        self.report_task = None
+        self.send_lock = threading.Lock()
+
+    def start(self, bot):
+        """Begin reporting status and listening for the launcher, called from setup_hook"""
+        self.bot = bot
+        threading.Thread(target=self.listen, name="cluster-ipc", daemon=True).start()
+        self.report_task = asyncio.create_task(self.report_periodically())
+
+    def send(self, message):
+        with self.send_lock:
+            self.connection.send(message)
+
+    def listen(self):
+        # recv blocks, so it runs on its own thread and hands messages to the event loop
+        while True:
+            try:
+                message = self.connection.recv()
+            except (EOFError, OSError):
+                break
+            asyncio.run_coroutine_threadsafe(self.handle(message), self.bot.loop)
+
+        logger.error("Lost connection to the cluster launcher, shutting down")
+        asyncio.run_coroutine_threadsafe(self.bot.close(), self.bot.loop)
+
+    async def handle(self, message):
+        op = message.get('op')
+        if op == 'presence':
+            self.presence = message['status']
+            # The launcher sends it before the shards connect, on_ready applies it then
+            if self.bot.is_ready():
+                await self.bot.change_presence(activity=discord.Game(name=self.presence))
+        elif op == 'statuses':
+            self.statuses = message['statuses']
+
+    async def report_periodically(self):
+        while True:
+            try:
+                self.send({'op': 'status', 'status': self.status()})
+            except (BrokenPipeError, OSError):
+                return
+            await asyncio.sleep(STATUS_INTERVAL)
+
+    def status(self):
+        """This cluster's numbers for /stats"""
+        bot = self.bot
+        latency = bot.latency
+        return {
+            'shards': list(bot.shard_ids or ()),
+            'guilds': len(bot.guilds),
+            'voice': len(bot.voice_clients),
+            'players': len(bot.players),
+            'latency_ms': round(latency * 1000) if math.isfinite(latency) else None,
+            'ready': bot.is_ready()
+        }
+
+    def set_presence(self, status):
+        """Change the status on every cluster"""
+        self.send({'op': 'presence', 'status': status})
+
+    def totals(self):
+        """Sum the latest reports of all clusters"""
+        statuses = self.statuses.values()
+        return {
+            'clusters': len(self.statuses),
+            'shards': sum(len(status['shards']) for status in statuses),
+            'guilds': sum(status['guilds'] for status in statuses),
+            'voice': sum(status['voice'] for status in statuses),
+            'players': sum(status['players'] for status in statuses)
+        }
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from utils.paths import get_data_path
+
+logger = logging.getLogger(__name__)
+
+def serialize_command(command, tree):
+    try:
+        return command.to_dict(tree)
+    except TypeError:
+        return command.to_dict()  # discord.py before 2.4 takes no tree
+
+def command_tree_hash(tree, guild=None):
+    """Hash of the command payload Discord would receive"""
+    payload = sorted(
+        (serialize_command(command, tree) for command in tree.get_commands(guild=guild)),
+        key=lambda command: (command.get('type', 1), command['name'])
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+class CommandSync:
+    """Syncs the command tree only when it changed since the last successful sync"""
+
+    def __init__(self, tree, application_id, path=None):
+        self.tree = tree
+        self.application_id = application_id
+        self.path = path or get_data_path('command_sync.json')
+        self.hashes = self.load()  # "application ID[:guild ID]" -> hash of the last synced tree
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading command sync state: {e}")
+            return {}
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.hashes, f, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving command sync state: {e}")
+
+    async def sync(self, guild=None, force=False):
+        """Sync global commands, or one guild's, returns whether Discord was called"""
+        key = f"{self.application_id}:{guild.id}" if guild else str(self.application_id)
+        tree_hash = command_tree_hash(self.tree, guild)
+        where = f"guild {guild.id}" if guild else "global"
+        if not force and self.hashes.get(key) == tree_hash:
+            logger.info(f"Commands unchanged, skipped {where} sync")
+            return False
+
+        started = time.perf_counter()
+        synced = await self.tree.sync(guild=guild)
+        # Only stored once Discord accepted it, so a failed sync is retried next start
+        self.hashes[key] = tree_hash
+        self.save()
+        logger.info(f"Synced {len(synced)} {where} command(s) in {time.perf_counter() - started:.2f}s")
+        return True
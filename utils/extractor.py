@@ -0,0 +1,364 @@
+import asyncio
+import copy
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import yt_dlp
+from utils.track import Track
+
+logger = logging.getLogger(__name__)
+
+# YoutubeDL owned by the current worker thread or process
+_worker_state = threading.local()
+
+class ExtractionError(Exception):
+    """Raised when a track or query could not be extracted"""
+    pass
+
+class TrackUnavailable(ExtractionError):
+    """Raised when a video is gone for good, e.g. private, deleted or blocked"""
+    pass
+
+class ExtractionQueueFull(Exception):
+    """Raised when too many extractions are waiting for a worker"""
+    pass
+
+# yt-dlp messages for videos that won't come back, anything else (timeouts, 429s) may work on a retry
+UNAVAILABLE_MESSAGES = (
+    'private video',
+    'video unavailable',
+    'this video is not available',
+    'has been removed',
+    'account associated with this video has been terminated',
+    'copyright',
+    'not available in your country',
+    'members-only',
+    'confirm your age',
+)
+
+def wrap_error(e):
+    """Turn a yt-dlp failure into TrackUnavailable or a retryable ExtractionError"""
+    message = str(e)
+    lowered = message.lower()
+    if any(text in lowered for text in UNAVAILABLE_MESSAGES):
+        return TrackUnavailable(message)
+    return ExtractionError(message)
+
+def get_worker_ydl(ydl_opts):
+    """Get the YoutubeDL instance owned by the current worker"""
+    ydl = getattr(_worker_state, 'ydl', None)
+    if ydl is None:
+        ydl = yt_dlp.YoutubeDL(ydl_opts)
+        _worker_state.ydl = ydl
+    return ydl
+
+def build_track(entry):
+    """Build a queue entry from extracted track info"""
+    return {
+        'url': entry.get('webpage_url', None) or f"https://www.youtube.com/watch?v={entry['id']}",
+        'title': entry.get('title', 'Unknown'),
+        'duration': entry.get('duration', 0)
+    }
+
+def select_best_format(info, title='Unknown'):
+    """Pick the best audio-only format from extracted track info, preferring Opus"""
+    formats = info.get('formats', [])
+    if not formats:
+        logger.error(f"No formats available for track: {title}")
+        raise ExtractionError("No audio formats available")
+
+    audio_formats = [f for f in formats if f.get('acodec') != 'none' and f.get('vcodec') == 'none']
+    
+    if not audio_formats:
+        audio_formats = formats
+        logger.warning(f"No audio-only formats found for {title}, using mixed formats")
+    
+    # Opus in webm can be passed to Discord without re-encoding
+    return sorted(
+        audio_formats,
+        key=lambda x: (
+            x.get('acodec') == 'opus' and x.get('ext') == 'webm',
+            x.get('abr', 0) or 0,
+            x.get('asr', 0) or 0
+        ),
+        reverse=True
+    )[0]
+
+def extract_tracks_task(ydl_opts, query):
+    """Worker task: resolve a URL or search to compact track records"""
+    try:
+        info = get_worker_ydl(ydl_opts).extract_info(query, download=False)
+    except Exception as e:
+        raise ExtractionError(str(e))
+
+    if not info:
+        raise ExtractionError("Nothing found for this query")
+
+    tracks = []
+    playlist_title = None
+
+    if 'entries' in info:  # Playlist or search results
+        if 'playlist' in query or 'list=' in query:  # It's a playlist
+            playlist_title = info.get('title', 'Unknown playlist')
+            for entry in info['entries']:
+                if entry:
+                    tracks.append(build_track(entry))
+        else:  # Search result
+            entries = [entry for entry in info['entries'] if entry]
+            if not entries:
+                raise ExtractionError("No results found")
+            tracks.append(build_track(entries[0]))
+    else:  # Single track
+        tracks.append(build_track(info))
+
+    return {'playlist_title': playlist_title, 'tracks': tracks}
+
+def stream_playlist_task(ydl_opts, query, first_batch, max_batch, emit, stop):
+    """Walk a flat playlist once, handing entries to emit in growing batches until stop is set"""
+    # Runs for the whole playlist on its own thread, so it can't share the per-worker YoutubeDL
+    ydl = yt_dlp.YoutubeDL(ydl_opts)
+    try:
+        # Unprocessed results keep entries lazy, each page is fetched once as the walk reaches it
+        info = ydl.extract_info(query, download=False, process=False)
+        # Watch URLs with a list= parameter point at the playlist instead of being it
+        for _ in range(3):
+            if not info or info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    except Exception as e:
+        raise ExtractionError(str(e))
+
+    if not info:
+        raise ExtractionError("Playlist unavailable")
+
+    playlist_title = info.get('title', 'Unknown playlist')
+    batch_size = first_batch
+    tracks = []
+    count = 0
+    try:
+        for entry in info.get('entries') or []:
+            if stop.is_set():
+                return
+            count += 1
+            if entry:
+                tracks.append(build_track(entry))
+            if count == batch_size:
+                emit({'playlist_title': playlist_title, 'tracks': tracks, 'count': count})
+                tracks = []
+                count = 0
+                batch_size = min(batch_size * 2, max_batch)
+    except Exception as e:
+        raise ExtractionError(str(e))
+
+    if count:
+        emit({'playlist_title': playlist_title, 'tracks': tracks, 'count': count})
+
+def extract_stream_task(ydl_opts, url):
+    """Worker task: resolve a track URL to a compact stream record"""
+    try:
+        info = get_worker_ydl(ydl_opts).extract_info(url, download=False)
+    except Exception as e:
+        raise wrap_error(e)
+
+    if not info:
+        logger.error(f"Failed to get track info: Info is None")
+        raise ExtractionError("Track unavailable")
+
+    title = info.get('title', 'Unknown')
+    best_format = select_best_format(info, title)
+
+    stream_url = best_format.get('url')
+    if not stream_url:
+        logger.error(f"No URL found in best format for track: {title}")
+        raise ExtractionError("No playable URL found")
+
+    return {
+        'url': stream_url,
+        'ext': best_format.get('ext'),
+        'acodec': best_format.get('acodec'),
+        'abr': best_format.get('abr'),
+        'duration': info.get('duration', 0)
+    }
+
+class PlaylistWalk:
+    """A running playlist walk, shared by every caller streaming the same playlist"""
+
+    __slots__ = ('batches', 'changed', 'stop', 'future', 'listeners')
+
+    def __init__(self):
+        self.batches = []  # Every batch emitted so far, replayed to callers that join late
+        self.changed = asyncio.Event()  # Replaced after each batch, set to wake the callers
+        self.stop = threading.Event()
+        self.future = None
+        self.listeners = 0
+
+    def add(self, batch):
+        """Store a batch from the worker thread and wake the callers waiting for it"""
+        self.batches.append(batch)
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+class ExtractionService:
+    """Bounded pool of extraction workers, each with its own YoutubeDL instance"""
+
+    def __init__(self, ydl_opts, workers=4, max_queue=32, queue_timeout=30, use_processes=False):
+        self.ydl_opts = ydl_opts
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.use_processes = use_processes
+        if use_processes:
+            # Separate interpreters keep yt-dlp's CPU work off the voice threads' GIL
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='extractor')
+        # Running plus waiting extractions are capped to apply backpressure
+        self.slots = asyncio.Semaphore(workers + max_queue)
+        self.pending = 0
+        # Identical concurrent requests share one extraction
+        self.in_flight = {}  # (task name, query, args) -> Running extraction
+        self.requests = 0
+        self.coalesced = 0
+        # Playlist walks are long and mostly wait on the network, so they get their own threads
+        self.playlist_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='playlist')
+        self.playlist_slots = asyncio.Semaphore(workers)
+        self.playlist_walks = {}  # (query, first batch, max batch) -> Running PlaylistWalk
+
+    async def submit(self, task, query, *args):
+        """Run an extraction task, sharing the result with identical concurrent requests"""
+        self.requests += 1
+        key = (task.__name__, query) + args
+        shared = self.in_flight.get(key)
+        if shared is not None:
+            self.coalesced += 1
+            result = await asyncio.shield(shared)
+            # Each caller gets its own copy so queues never share track dicts
+            return copy.deepcopy(result)
+
+        shared = asyncio.ensure_future(self.run(task, query, *args))
+        self.in_flight[key] = shared
+
+        def forget(future):
+            self.in_flight.pop(key, None)
+            if not future.cancelled():
+                future.exception()  # Mark as retrieved if every caller went away
+
+        shared.add_done_callback(forget)
+        return await asyncio.shield(shared)
+
+    async def run(self, task, query, *args):
+        """Run an extraction task on the pool without blocking the event loop"""
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Extraction queue full ({self.pending} pending), rejecting: {query}")
+            raise ExtractionQueueFull("Too many requests are being processed, please try again shortly")
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, task, self.ydl_opts, query, *args)
+        finally:
+            self.pending -= 1
+            self.slots.release()
+
+    async def extract_tracks(self, query):
+        """Resolve a URL or search query, returns {'playlist_title', 'tracks'}"""
+        result = await self.submit(extract_tracks_task, query)
+        # The result dict is shared with coalesced callers, so build a new one instead of changing it
+        return {**result, 'tracks': [Track.from_dict(track) for track in result['tracks']]}
+
+    def start_walk(self, key):
+        """Start walking a playlist on the playlist threads, the caller holds a playlist slot"""
+        loop = asyncio.get_running_loop()
+        query, first_batch, max_batch = key
+        walk = PlaylistWalk()
+
+        def emit(batch):
+            loop.call_soon_threadsafe(walk.add, batch)
+
+        try:
+            walk.future = loop.run_in_executor(
+                self.playlist_executor, stream_playlist_task, self.ydl_opts, query, first_batch, max_batch, emit, walk.stop
+            )
+        except Exception:
+            self.playlist_slots.release()
+            raise
+        self.playlist_walks[key] = walk
+
+        def finished(future):
+            self.playlist_slots.release()
+            if self.playlist_walks.get(key) is walk:
+                del self.playlist_walks[key]
+            if not future.cancelled():
+                future.exception()  # Mark as retrieved if every caller went away
+
+        walk.future.add_done_callback(finished)
+        return walk
+
+    async def stream_playlist(self, query, first_batch, max_batch):
+        """Walk a playlist once in the background, yielding {'playlist_title', 'tracks', 'count'} batches"""
+        self.requests += 1
+        key = (query, first_batch, max_batch)
+        walk = self.playlist_walks.get(key)
+        if walk is None:
+            try:
+                await asyncio.wait_for(self.playlist_slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"All playlist workers busy ({len(self.playlist_walks)} walks), rejecting: {query}")
+                raise ExtractionQueueFull("Too many playlists are being loaded, please try again shortly")
+            # Someone may have started the same walk while we waited
+            walk = self.playlist_walks.get(key)
+            if walk is None:
+                walk = self.start_walk(key)
+            else:
+                self.playlist_slots.release()
+                self.coalesced += 1
+        else:
+            self.coalesced += 1
+
+        walk.listeners += 1
+        index = 0
+        try:
+            while True:
+                # Callers that joined late replay the batches emitted so far, then follow the live ones
+                while index < len(walk.batches):
+                    batch = walk.batches[index]
+                    index += 1
+                    # Workers return plain dicts, every caller builds its own compact tracks from them
+                    yield {**batch, 'tracks': [Track.from_dict(track) for track in batch['tracks']]}
+
+                # Batches are handed over before the walk's result, so none are left behind
+                if walk.future.done():
+                    walk.future.result()
+                    return
+
+                changed = asyncio.ensure_future(walk.changed.wait())
+                try:
+                    await asyncio.wait({changed, walk.future}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    changed.cancel()
+        finally:
+            walk.listeners -= 1
+            # The walk stops once nobody follows it, later callers start a new one
+            if not walk.listeners and not walk.future.done():
+                walk.stop.set()
+                if self.playlist_walks.get(key) is walk:
+                    del self.playlist_walks[key]
+
+    async def extract_stream(self, url):
+        """Resolve a track URL to its best audio stream"""
+        return await self.submit(extract_stream_task, url)
+
+    def stats(self):
+        """Get extraction counters"""
+        return {
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'in_flight': len(self.in_flight) + len(self.playlist_walks),
+            'pending': self.pending
+        }
+
+    def shutdown(self):
+        """Stop the workers"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.playlist_executor.shutdown(wait=False, cancel_futures=True)
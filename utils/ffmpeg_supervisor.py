@@ -0,0 +1,185 @@
+import os
+import sys
+import time
+import logging
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_PLAYBACK = 0    # Audio someone is listening to
+PRIORITY_BACKGROUND = 1  # Loudness analysis, cache downloads
+
+class FFmpegLimitReached(Exception):
+    """Raised when no FFmpeg process slot is available"""
+    pass
+
+def read_proc_usage(pid):
+    """Read (cpu seconds, rss bytes) for a process from /proc, None if unavailable"""
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        # utime and stime are fields 14 and 15, rss is field 24 (1-based, counted from the pid)
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks
+        rss = int(fields[21]) * page_size
+        return cpu_seconds, rss
+    except (OSError, IndexError, ValueError):
+        return None
+
+class FFmpegSupervisor:
+    """Tracks every FFmpeg child the bot spawns, with a process cap, reaping and priorities"""
+
+    def __init__(self, max_processes=64, niceness=None, background_niceness=None):
+        self.max_processes = max_processes
+        self.niceness = niceness  # Applied to playback processes, None leaves them alone
+        self.background_niceness = background_niceness
+        self.processes = {}  # PID -> Process entry
+        self.killed = 0
+        self.reaped = 0
+
+    @staticmethod
+    def is_running(process):
+        """Check a Popen or asyncio subprocess without blocking"""
+        if hasattr(process, 'poll'):
+            return process.poll() is None  # Also reaps the zombie
+        return process.returncode is None
+
+    def count(self, priority=None):
+        return sum(1 for entry in self.processes.values() if priority is None or entry['priority'] == priority)
+
+    def ensure_capacity(self, priority=PRIORITY_PLAYBACK):
+        """Make room for a new process, preempting background work for playback"""
+        self.reap()
+        if len(self.processes) < self.max_processes:
+            return
+
+        if priority == PRIORITY_PLAYBACK:
+            background = [pid for pid, entry in self.processes.items() if entry['priority'] == PRIORITY_BACKGROUND]
+            if background:
+                oldest = min(background, key=lambda pid: self.processes[pid]['started'])
+                logger.info(f"FFmpeg limit reached, stopping background process {oldest} for playback")
+                self.kill(oldest)
+                return
+
+        raise FFmpegLimitReached(f"Too many FFmpeg processes running ({self.max_processes})")
+
+    def register(self, process, guild_id=None, kind='playback', priority=PRIORITY_PLAYBACK):
+        """Take ownership of a spawned FFmpeg process"""
+        if process is None:
+            return
+
+        self.processes[process.pid] = {
+            'process': process,
+            'guild_id': guild_id,
+            'kind': kind,
+            'priority': priority,
+            'started': time.monotonic(),
+            'last_cpu': None,
+            'last_sample': None
+        }
+
+        niceness = self.niceness if priority == PRIORITY_PLAYBACK else self.background_niceness
+        if niceness is not None:
+            self.renice(process.pid, niceness)
+
+    @staticmethod
+    def renice(pid, niceness):
+        """Lower the scheduling priority of a process"""
+        try:
+            if hasattr(os, 'setpriority'):
+                os.setpriority(os.PRIO_PROCESS, pid, niceness)
+            elif psutil and sys.platform == 'win32':
+                priority_class = psutil.BELOW_NORMAL_PRIORITY_CLASS if niceness > 0 else psutil.NORMAL_PRIORITY_CLASS
+                psutil.Process(pid).nice(priority_class)
+        except Exception as e:
+            logger.debug(f"Could not renice FFmpeg process {pid}: {e}")
+
+    def kill(self, pid):
+        """Kill a tracked process and forget it"""
+        entry = self.processes.pop(pid, None)
+        if not entry:
+            return
+
+        process = entry['process']
+        try:
+            if self.is_running(process):
+                process.kill()
+                self.killed += 1
+            if hasattr(process, 'poll'):
+                process.poll()
+        except Exception as e:
+            logger.debug(f"Error killing FFmpeg process {pid}: {e}")
+
+    def kill_guild(self, guild_id):
+        """Kill every process belonging to a guild"""
+        for pid in [pid for pid, entry in self.processes.items() if entry['guild_id'] == guild_id]:
+            self.kill(pid)
+
+    def reap(self):
+        """Forget processes that have exited"""
+        for pid in [pid for pid, entry in self.processes.items() if not self.is_running(entry['process'])]:
+            del self.processes[pid]
+            self.reaped += 1
+
+    def guild_ids(self):
+        return {entry['guild_id'] for entry in self.processes.values() if entry['guild_id'] is not None}
+
+    def sample(self, pid):
+        """Get CPU percent since the last sample and RSS bytes for a process"""
+        entry = self.processes[pid]
+        if psutil:
+            try:
+                info = psutil.Process(pid)
+                return info.cpu_percent(interval=None), info.memory_info().rss
+            except Exception:
+                return None, None
+
+        usage = read_proc_usage(pid)
+        if usage is None:
+            return None, None
+
+        cpu_seconds, rss = usage
+        now = time.monotonic()
+        cpu_percent = None
+        if entry['last_sample'] is not None and now > entry['last_sample']:
+            cpu_percent = (cpu_seconds - entry['last_cpu']) / (now - entry['last_sample']) * 100
+        entry['last_cpu'] = cpu_seconds
+        entry['last_sample'] = now
+        return cpu_percent, rss
+
+    def stats(self):
+        """Get per-process CPU/RSS and totals"""
+        self.reap()
+        processes = []
+        for pid, entry in self.processes.items():
+            cpu_percent, rss = self.sample(pid)
+            processes.append({
+                'pid': pid,
+                'guild_id': entry['guild_id'],
+                'kind': entry['kind'],
+                'age': time.monotonic() - entry['started'],
+                'cpu_percent': cpu_percent,
+                'rss': rss
+            })
+
+        return {
+            'running': len(processes),
+            'playback': self.count(PRIORITY_PLAYBACK),
+            'background': self.count(PRIORITY_BACKGROUND),
+            'max': self.max_processes,
+            'killed': self.killed,
+            'reaped': self.reaped,
+            'cpu_percent': sum(p['cpu_percent'] or 0 for p in processes),
+            'rss': sum(p['rss'] or 0 for p in processes),
+            'processes': processes
+        }
+
+    def shutdown(self):
+        """Kill every tracked process"""
+        for pid in list(self.processes):
+            self.kill(pid)
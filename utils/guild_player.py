@@ -0,0 +1,68 @@
+import asyncio
+from utils.track import TrackQueue
+
+class GuildPlayer:
+    """All queue and playback state for one guild"""
+
+    # Slots keep thousands of idle players small and catch typos in attribute names
+    __slots__ = (
+        'guild_id',
+        'queue',  # TrackQueue
+        'position',  # Index of the current track in the queue
+        'now_playing',  # Track currently playing
+        'current_song',  # Track kept playing after /queue clear
+        'next_position',  # {'position', 'channel'} queued by /queue position
+        'repeat_mode',  # off/all/single
+        'loop_mode',  # off/on/single
+        'volume',  # 0-100
+        'normalize',  # Loudness normalization on/off
+        'crossfade',  # Crossfade length in seconds (0 = off)
+        'auto_clear',  # Clear the queue on /stop
+        'original_channel',  # Channel that started playback, for Now Playing messages
+        'stopped_position',  # Queue position when /stop was used
+        'stopped_at',  # (track URL, seconds into it) when stopped
+        'lock',  # Held while a command or song_finished changes what is playing
+        'playback_done',  # Set by the player's after callback once the current source has stopped
+        'current_stream',  # Stream record of the playing track
+        'gapless_source',  # GaplessSource currently playing
+        'prefetched',  # Pre-resolved stream for the upcoming track
+        'prefetch_task',  # Running prefetch task
+        'prespawn_task',  # Task spawning the next track's FFmpeg
+        'playlist_task',  # Background playlist loading task
+        'validate_task',  # Task checking upcoming tracks for unavailable videos
+        'track_ended_at',  # When the last source ended, for gap measurement
+        'recovery_attempts',  # (track URL, stream recoveries used)
+        'broadcast',  # Station name this guild is listening to
+    )
+
+    def __init__(self, guild_id):
+        self.guild_id = guild_id
+        self.queue = TrackQueue()
+        self.position = 0
+        self.now_playing = None
+        self.current_song = None
+        self.next_position = None
+        self.repeat_mode = 'off'
+        self.loop_mode = 'off'
+        self.volume = 100
+        self.normalize = False
+        self.crossfade = 0
+        self.auto_clear = False
+        self.original_channel = None
+        self.stopped_position = None
+        self.stopped_at = None
+        self.lock = asyncio.Lock()
+        self.playback_done = None
+        self.current_stream = None
+        self.gapless_source = None
+        self.prefetched = None
+        self.prefetch_task = None
+        self.prespawn_task = None
+        self.playlist_task = None
+        self.validate_task = None
+        self.track_ended_at = None
+        self.recovery_attempts = None
+        self.broadcast = None
+
+    def __repr__(self):
+        return f"<GuildPlayer guild_id={self.guild_id} tracks={len(self.queue)} position={self.position}>"
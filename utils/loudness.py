@@ -0,0 +1,131 @@
+import os
+import re
+import json
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from utils.paths import get_data_path
+from utils.ffmpeg_supervisor import PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# EBU R128 target: integrated loudness, true peak and loudness range
+LOUDNORM_TARGET = 'I=-16:TP=-1.5:LRA=11'
+
+def build_loudnorm_filter(measurement=None):
+    """Build the loudnorm filter, using linear mode when the track was measured before"""
+    if not measurement:
+        # Single pass dynamic normalization for tracks that were never measured
+        return f"loudnorm={LOUDNORM_TARGET}"
+
+    return (
+        f"loudnorm={LOUDNORM_TARGET}"
+        f":measured_I={measurement['input_i']}"
+        f":measured_TP={measurement['input_tp']}"
+        f":measured_LRA={measurement['input_lra']}"
+        f":measured_thresh={measurement['input_thresh']}"
+        f":offset={measurement['target_offset']}"
+        f":linear=true"
+    )
+
+async def measure_loudness(stream_url, executable='ffmpeg', supervisor=None, guild_id=None):
+    """Run a loudnorm analysis pass over a stream and return its measurements"""
+    if supervisor:
+        supervisor.ensure_capacity(PRIORITY_BACKGROUND)
+
+    # Reconnect options only apply to remote streams, not cached files
+    input_options = []
+    if stream_url.startswith('http'):
+        input_options = ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5']
+
+    process = await asyncio.create_subprocess_exec(
+        executable, '-hide_banner', '-nostats',
+        *input_options,
+        '-i', stream_url,
+        '-vn', '-af', f"loudnorm={LOUDNORM_TARGET}:print_format=json",
+        '-f', 'null', '-',
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    if supervisor:
+        supervisor.register(process, guild_id=guild_id, kind='loudness', priority=PRIORITY_BACKGROUND)
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+
+    # loudnorm prints its JSON summary as the last block on stderr
+    match = re.search(r'\{[^{}]*"input_i"[^{}]*\}', stderr.decode('utf-8', 'ignore'))
+    if not match:
+        raise Exception("No loudness measurement in FFmpeg output")
+
+    data = json.loads(match.group(0))
+    return {key: data[key] for key in ('input_i', 'input_tp', 'input_lra', 'input_thresh', 'target_offset')}
+
+class LoudnessCache:
+    """Persistent LRU cache of loudness measurements keyed by video ID"""
+
+    def __init__(self, path=None, max_size=5000):
+        self.path = path or get_data_path('loudness.json')
+        self.max_size = max_size
+        self.entries = OrderedDict()  # Video ID -> Measurement
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Load measurements from disk"""
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading loudness cache: {e}")
+            return
+
+        for video_id, measurement in data.get('entries', []):
+            self.entries[video_id] = measurement
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        """Write measurements to disk if anything changed"""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {'entries': list(self.entries.items())}
+            self.dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving loudness cache: {e}")
+
+    def get(self, video_id):
+        """Return the stored measurement for a video"""
+        if not video_id:
+            return None
+
+        with self.lock:
+            measurement = self.entries.get(video_id)
+            if measurement is not None:
+                self.entries.move_to_end(video_id)
+            return measurement
+
+    def put(self, video_id, measurement):
+        """Store a measurement, evicting the least recently used entries"""
+        with self.lock:
+            self.entries[video_id] = measurement
+            self.entries.move_to_end(video_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            self.dirty = True
@@ -0,0 +1,14 @@
+import os
+import sys
+
+def get_base_path():
+    """Get the directory the bot runs from (exe directory or project root)"""
+    if getattr(sys, 'frozen', False):
+        # If running as exe (PyInstaller)
+        return os.path.dirname(sys.executable)
+    # If running as script
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def get_data_path(*parts):
+    """Get a path inside the bot's data directory"""
+    return os.path.join(get_base_path(), 'data', *parts)
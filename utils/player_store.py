@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from utils.guild_player import GuildPlayer
+from utils.paths import get_data_path
+from utils.track import Track, TrackQueue
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    guild_id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    repeat_mode TEXT NOT NULL,
+    loop_mode TEXT NOT NULL,
+    volume INTEGER NOT NULL,
+    normalize INTEGER NOT NULL,
+    crossfade INTEGER NOT NULL,
+    auto_clear INTEGER NOT NULL,
+    shuffle_order BLOB,
+    stopped_url TEXT,
+    stopped_seconds REAL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    guild_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    video_id TEXT,
+    title TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    source_url TEXT,
+    added_by INTEGER,
+    PRIMARY KEY (guild_id, idx)
+) WITHOUT ROWID;
+"""
+
+class PlayerStore:
+    """SQLite store of per-guild queues and settings so they survive restarts"""
+
+    def __init__(self, path=None, flush_interval=2.0):
+        self.path = path or get_data_path('players.db')
+        self.flush_interval = flush_interval
+        self.connection = None
+        # One writer thread owns the connection, so reads and writes never touch the event loop
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='player-store')
+        self.pending = {}  # Guild ID -> GuildPlayer to write, or None to delete
+        self.saved_guilds = set()  # Guild IDs with state in the database
+        self.flush_task = None
+        self.writes = 0
+        self.batches = 0
+
+    async def open(self):
+        """Open the database and start the background flush"""
+        loop = asyncio.get_running_loop()
+        self.saved_guilds = await loop.run_in_executor(self.executor, self.connect)
+        self.flush_task = asyncio.create_task(self.flush_periodically())
+        logger.info(f"Player store opened with saved state for {len(self.saved_guilds)} guild(s)")
+
+    def connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        # Databases from before tracks remembered who queued them
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(tracks)")}
+        if 'added_by' not in columns:
+            self.connection.execute("ALTER TABLE tracks ADD COLUMN added_by INTEGER")
+        return {row[0] for row in self.connection.execute("SELECT guild_id FROM players")}
+
+    async def close(self):
+        """Write anything pending and close the database"""
+        if self.flush_task:
+            self.flush_task.cancel()
+            self.flush_task = None
+        if self.connection:
+            await self.flush()
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.connection.close)
+            self.connection = None
+        self.executor.shutdown(wait=True)
+
+    def save(self, player):
+        """Mark a guild's state for the next batched write"""
+        self.pending[player.guild_id] = player
+
+    def delete(self, guild_id):
+        """Forget a guild's saved state"""
+        self.pending[guild_id] = None
+
+    async def load(self, guild_id):
+        """Rebuild a guild's player from the database, None if nothing is saved"""
+        # A player dropped from memory but not written yet is still the latest state
+        if guild_id in self.pending:
+            return self.pending[guild_id]
+        if guild_id not in self.saved_guilds or not self.connection:
+            return None
+
+        row, tracks = await asyncio.get_running_loop().run_in_executor(self.executor, self.read, guild_id)
+        if row is None:
+            return None
+
+        (position, repeat_mode, loop_mode, volume, normalize, crossfade, auto_clear,
+         shuffle_order, stopped_url, stopped_seconds) = row
+
+        queue = TrackQueue(Track(*row) for row in tracks)
+        queue.persisted = len(queue.tracks)
+        if shuffle_order and len(shuffle_order) == 4 * len(queue.tracks):
+            queue.order = array('I')
+            queue.order.frombytes(shuffle_order)
+            queue.shuffled = True
+
+        player = GuildPlayer(guild_id)
+        player.queue = queue
+        player.position = position
+        player.repeat_mode = repeat_mode
+        player.loop_mode = loop_mode
+        player.volume = volume
+        player.normalize = bool(normalize)
+        player.crossfade = crossfade
+        player.auto_clear = bool(auto_clear)
+        if stopped_url:
+            player.stopped_at = (stopped_url, stopped_seconds)
+        return player
+
+    def read(self, guild_id):
+        row = self.connection.execute(
+            "SELECT position, repeat_mode, loop_mode, volume, normalize, crossfade, auto_clear, "
+            "shuffle_order, stopped_url, stopped_seconds FROM players WHERE guild_id = ?",
+            (guild_id,)
+        ).fetchone()
+        tracks = self.connection.execute(
+            "SELECT video_id, title, duration, source_url, added_by FROM tracks WHERE guild_id = ? ORDER BY idx",
+            (guild_id,)
+        ).fetchall()
+        return row, tracks
+
+    async def flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Write every pending guild in one transaction"""
+        if not self.pending or not self.connection:
+            return
+
+        pending, self.pending = self.pending, {}
+        # Rows are built here on the loop so they match the queue at one instant
+        batch = [(guild_id, self.snapshot(player) if player else None) for guild_id, player in pending.items()]
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.write, batch)
+        except Exception as e:
+            logger.error(f"Error saving player state: {e}")
+            # Write everything again next time, unless it was changed since
+            for guild_id, player in pending.items():
+                if player:
+                    player.queue.persisted = 0
+                self.pending.setdefault(guild_id, player)
+            return
+
+        for guild_id, state in batch:
+            if state:
+                self.saved_guilds.add(guild_id)
+            else:
+                self.saved_guilds.discard(guild_id)
+        self.writes += len(batch)
+        self.batches += 1
+
+    @staticmethod
+    def snapshot(player):
+        """Collect the rows that changed since the last write"""
+        queue = player.queue
+        # Growing queues only insert the new tail, anything else rewrites the guild's tracks
+        length = len(queue)
+        start = queue.persisted if queue.persisted <= length else 0
+        # Rows are numbered without the holes removals leave, so the queue isn't compacted for every write
+        rows = [
+            (player.guild_id, index, track.video_id, track.title, track.duration, track.source_url, track.added_by)
+            for index, track in enumerate(queue.stored_tracks(start), start)
+        ]
+        queue.persisted = length
+        order = queue.stored_order()
+
+        stopped_url, stopped_seconds = player.stopped_at or (None, None)
+        return {
+            'replace': start == 0,
+            'tracks': rows,
+            'player': (
+                player.guild_id, player.position, player.repeat_mode, player.loop_mode, player.volume,
+                int(player.normalize), player.crossfade, int(player.auto_clear),
+                order.tobytes() if order is not None else None,
+                stopped_url, stopped_seconds, time.time()
+            )
+        }
+
+    def write(self, batch):
+        with self.connection:
+            for guild_id, state in batch:
+                if state is None or state['replace']:
+                    self.connection.execute("DELETE FROM tracks WHERE guild_id = ?", (guild_id,))
+                if state is None:
+                    self.connection.execute("DELETE FROM players WHERE guild_id = ?", (guild_id,))
+                    continue
+
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO tracks (guild_id, idx, video_id, title, duration, source_url, added_by) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    state['tracks']
+                )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO players (guild_id, position, repeat_mode, loop_mode, volume, normalize, "
+                    "crossfade, auto_clear, shuffle_order, stopped_url, stopped_seconds, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    state['player']
+                )
+
+    def stats(self):
+        return {
+            'guilds': len(self.saved_guilds),
+            'pending': len(self.pending),
+            'writes': self.writes,
+            'batches': self.batches
+        }
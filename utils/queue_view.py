@@ -0,0 +1,89 @@
+import discord
+from utils.track import format_timestamp
+
+QUEUE_PAGE_SIZE = 15
+MAX_TITLE_LENGTH = 90  # Keeps a full page well under Discord's 4096 character embed limit
+
+class QueueView(discord.ui.View):
+    """Paged /queue embed that renders only the visible page of the guild's live queue"""
+
+    def __init__(self, player, page_size=QUEUE_PAGE_SIZE, timeout=180):
+        super().__init__(timeout=timeout)
+        # Holds the player rather than a copy, so every page shows the queue as it is now
+        self.player = player
+        self.page_size = page_size
+        self.page = min(player.position, max(len(player.queue) - 1, 0)) // page_size
+        self.message = None
+
+    @property
+    def page_count(self):
+        return max(1, -(-len(self.player.queue) // self.page_size))
+
+    def build_embed(self):
+        """Render the current page"""
+        queue = self.player.queue
+        current_pos = self.player.position
+        self.page = min(self.page, self.page_count - 1)
+        start = self.page * self.page_size
+        end = min(start + self.page_size, len(queue))
+
+        lines = []
+        for i in range(start, end):
+            title = queue[i].title
+            if len(title) > MAX_TITLE_LENGTH:
+                title = f"{title[:MAX_TITLE_LENGTH - 3]}..."
+            prefix = "▶️ " if i == current_pos else f"{i + 1}. "
+            lines.append(f"{prefix}{title}")
+
+        next_position = self.player.next_position
+        if next_position and next_position['position'] < len(queue):
+            lines.append(f"\nNext up: {queue[next_position['position']].title[:MAX_TITLE_LENGTH]}")
+
+        embed = discord.Embed(
+            title="Current Queue",
+            description="\n".join(lines) or "Queue is empty!",
+            color=discord.Color.blue()
+        )
+        embed.set_footer(
+            text=f"Page {self.page + 1}/{self.page_count} | {len(queue)} songs | {format_timestamp(queue.total_duration)} total"
+        )
+        self.update_buttons()
+        return embed
+
+    def update_buttons(self):
+        """Disable the buttons that would leave the queue"""
+        at_start = self.page == 0
+        at_end = self.page >= self.page_count - 1
+        self.first_page.disabled = at_start
+        self.previous_page.disabled = at_start
+        self.next_page.disabled = at_end
+        self.last_page.disabled = at_end
+
+    async def show_page(self, interaction, page):
+        self.page = max(0, min(page, self.page_count - 1))
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.secondary)
+    async def first_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, 0)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page - 1)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page + 1)
+
+    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.secondary)
+    async def last_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page_count - 1)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from utils.paths import get_data_path
+from utils.track import Track
+
+logger = logging.getLogger(__name__)
+
+class SearchCache:
+    """Persistent LRU cache mapping normalized search queries to tracks"""
+
+    def __init__(self, path=None, max_size=2000, ttl=7 * 24 * 3600):
+        self.path = path or get_data_path('search_cache.json')
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # Normalized query -> (track, stored at)
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def normalize(query):
+        """Normalize a search query so equivalent searches share an entry"""
+        return ' '.join(query.lower().split())
+
+    def load(self):
+        """Load cached searches from disk"""
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading search cache: {e}")
+            return
+
+        now = time.time()
+        # Entries are stored oldest first to keep LRU order across restarts
+        for key, track, stored_at in data.get('entries', []):
+            if now - stored_at < self.ttl:
+                self.entries[key] = (track, stored_at)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        """Write cached searches to disk if anything changed"""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {'entries': [[key, track, stored_at] for key, (track, stored_at) in self.entries.items()]}
+            self.dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving search cache: {e}")
+
+    def get(self, query):
+        """Return the cached track for a search query"""
+        key = self.normalize(query)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            track, stored_at = entry
+            if time.time() - stored_at >= self.ttl:
+                del self.entries[key]
+                self.dirty = True
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return Track.from_dict(track)
+
+    def put(self, query, track):
+        """Store the track a search query resolved to"""
+        key = self.normalize(query)
+        with self.lock:
+            self.entries[key] = (track.to_dict(), time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def stats(self):
+        """Get hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'hit_rate': self.hits / total if total else 0.0
+        }
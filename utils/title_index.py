@@ -0,0 +1,98 @@
+import re
+from array import array
+from bisect import bisect_left, insort
+
+TOKEN_PATTERN = re.compile(r'\w+')
+MIN_PREFIX = 2  # Shorter query words match whole words only
+LAST_CHARACTER = chr(0x10FFFF)  # Sorts after every word sharing a prefix
+HOLE = 0xFFFFFFFF  # New index of a removed track when a queue is compacted
+
+def renumber(indexes, new_indexes):
+    """Map indexes into tracks through a compaction, dropping removed tracks, returns them ascending"""
+    renumbered = sorted(map(new_indexes.__getitem__, indexes))
+    return array('I', renumbered[:bisect_left(renumbered, HOLE)])
+
+def tokenize(text):
+    """Split a title or query into lowercase words"""
+    return TOKEN_PATTERN.findall(text.casefold())
+
+def query_terms(query):
+    """Distinct words of a query, longest first since longer words match fewer titles"""
+    return sorted(set(tokenize(query)), key=len, reverse=True)
+
+def term_matches(term, word):
+    return word == term if len(term) < MIN_PREFIX else word.startswith(term)
+
+def title_matches(title, terms):
+    """Whether a title matches query terms the way TitleIndex.search does"""
+    words = tokenize(title)
+    return all(any(term_matches(term, word) for word in words) for term in terms)
+
+class TitleIndex:
+    """Word index over a queue's titles, every query word matches as a prefix"""
+
+    __slots__ = ('postings', 'tokens')
+
+    def __init__(self, tracks=()):
+        self.postings = {}  # Word -> Indexes into the queue's tracks, ascending, removed tracks stay until compaction
+        for index, track in enumerate(tracks):
+            if track is None:
+                continue  # Removed, waiting for the queue to be compacted
+            self.add_postings(index, track.title)
+        self.tokens = sorted(self.postings)  # Distinct words, for prefix lookups
+
+    def add_postings(self, index, title):
+        new_tokens = []
+        for token in set(tokenize(title)):
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = array('I')
+                new_tokens.append(token)
+            postings.append(index)
+        return new_tokens
+
+    def add(self, index, title):
+        """Index a track appended at index"""
+        for token in self.add_postings(index, title):
+            insort(self.tokens, token)
+
+    def renumber(self, new_indexes):
+        """Follow a compaction of the queue's tracks instead of rebuilding from the titles"""
+        postings = {}
+        for token, indexes in self.postings.items():
+            indexes = renumber(indexes, new_indexes)
+            if indexes:
+                postings[token] = indexes
+        if len(postings) != len(self.postings):
+            self.tokens = sorted(postings)
+        self.postings = postings
+
+    def prefix_tokens(self, prefix):
+        """Indexed words starting with prefix, a whole word only when prefix is too short"""
+        if len(prefix) < MIN_PREFIX:
+            return [prefix] if prefix in self.postings else []
+        start = bisect_left(self.tokens, prefix)
+        return self.tokens[start:bisect_left(self.tokens, prefix + LAST_CHARACTER, start)]
+
+    def prefix_matches(self, prefix):
+        """Indexes of tracks with a word starting with prefix"""
+        matches = set()
+        for token in self.prefix_tokens(prefix):
+            matches.update(self.postings[token])
+        return matches
+
+    def match_count(self, term):
+        """Upper bound on the tracks a query term matches, without building the set"""
+        return sum(map(len, map(self.postings.__getitem__, self.prefix_tokens(term))))
+
+    def search(self, terms):
+        """Indexes of tracks whose title contains every one of the query terms"""
+        if not terms:
+            return set()
+
+        candidates = self.prefix_matches(terms[0])
+        for term in terms[1:]:
+            if not candidates:
+                break
+            candidates &= self.prefix_matches(term)
+        return candidates
@@ -0,0 +1,389 @@
+import re
+import sys
+import heapq
+import itertools
+import random
+from array import array
+from utils.title_index import TitleIndex, HOLE, renumber, query_terms, title_matches
+
+VIDEO_ID_PATTERN = re.compile(r'(?:v=|youtu\.be/|shorts/|embed/)([A-Za-z0-9_-]{11})')
+YOUTUBE_URL = "https://www.youtube.com/watch?v={}"
+SEARCH_SCAN = 400  # Titles a search reads in play order before falling back to the index
+
+def get_video_id(url):
+    """Extract the YouTube video ID from a track URL"""
+    match = VIDEO_ID_PATTERN.search(url or '')
+    return match.group(1) if match else None
+
+def format_timestamp(seconds):
+    """Format seconds as m:ss or h:mm:ss"""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+class Track:
+    """A queued song, kept small since large playlists hold thousands of these"""
+
+    __slots__ = ('video_id', 'title', 'duration', 'source_url', 'added_by')
+
+    def __init__(self, video_id, title, duration=0, source_url=None, added_by=None):
+        self.video_id = video_id
+        # The same titles show up in many guilds' queues, so share one string
+        self.title = sys.intern(title or 'Unknown')
+        self.duration = int(duration or 0)
+        self.source_url = source_url  # Only stored when the URL can't be rebuilt from a YouTube ID
+        self.added_by = added_by  # ID of the user who queued it
+
+    @property
+    def url(self):
+        return self.source_url or YOUTUBE_URL.format(self.video_id)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a track from extractor output or a persisted record"""
+        url = data.get('url')
+        video_id = get_video_id(url)
+        return cls(video_id, data.get('title'), data.get('duration'), None if video_id else url)
+
+    def to_dict(self):
+        """Plain record for JSON storage"""
+        return {'url': self.url, 'title': self.title, 'duration': self.duration}
+
+    def __repr__(self):
+        return f"<Track {self.video_id or self.source_url} {self.title!r}>"
+
+def track_key(track):
+    """What makes two queued tracks the same song"""
+    return track.video_id or track.source_url
+
+class TrackQueue:
+    """Tracks in the order they were added, with an optional play order on top for shuffles, moves and removals"""
+
+    __slots__ = (
+        'tracks', 'order', 'shuffled', 'positions', 'holes', 'total_duration', 'persisted', 'stored', 'index',
+        'first_copies', 'repeated', 'by_user'
+    )
+
+    def __init__(self, tracks=None):
+        self.tracks = list(tracks or [])
+        self.order = None  # Play position -> index into tracks, None while tracks are in play order
+        self.shuffled = False  # Whether order is a shuffle, otherwise it only reflects removals and moves
+        self.positions = None  # Index into tracks -> play position, built from order when a search needs it
+        self.holes = 0  # Removed tracks left as None in tracks, so nothing built on indexes needs renumbering
+        self.total_duration = sum(track.duration for track in self.tracks)  # Kept up to date so /queue never sums
+        self.persisted = 0  # Leading tracks already written to the player store, 0 forces a full rewrite
+        self.stored = None  # stored_order() of a shuffled queue with holes, kept up to date between removals
+        self.index = None  # TitleIndex, built on the first search and then kept up to date
+        # Built on the first dedupe and then kept up to date
+        self.first_copies = None  # Track key -> index of a copy in tracks
+        self.repeated = None  # Track key -> indexes of every copy, for songs queued more than once
+        self.by_user = None  # User ID -> indexes of the tracks they queued, built on the first /remove user
+
+    def __len__(self):
+        if self.order is None:
+            return len(self.tracks)
+        return len(self.order)
+
+    def __getitem__(self, position):
+        if self.order is None:
+            return self.tracks[position]
+        return self.tracks[self.order[position]]
+
+    def __iter__(self):
+        if self.order is None:
+            return iter(self.tracks)
+        tracks = self.tracks
+        return (tracks[index] for index in self.order)
+
+    def append(self, track, added_by=None):
+        if added_by is not None:
+            track.added_by = added_by
+        if self.order is not None:
+            self.order.append(len(self.tracks))
+            if self.positions is not None:
+                self.positions.append(len(self.order) - 1)
+            if self.stored is not None:
+                self.stored.append(len(self.tracks) - self.holes)
+        self.tracks.append(track)
+        self.total_duration += track.duration
+        self.track_added(len(self.tracks) - 1, track)
+
+    def extend(self, tracks, added_by=None):
+        start = len(self.tracks)
+        self.tracks.extend(tracks)
+        if added_by is not None:
+            for index in range(start, len(self.tracks)):
+                self.tracks[index].added_by = added_by
+        self.total_duration += sum(self.tracks[index].duration for index in range(start, len(self.tracks)))
+        # New tracks play after everything already queued, shuffled or not
+        if self.order is not None:
+            first_position = len(self.order)
+            self.order.extend(range(start, len(self.tracks)))
+            if self.positions is not None:
+                self.positions.extend(range(first_position, len(self.order)))
+            if self.stored is not None:
+                self.stored.extend(range(start - self.holes, len(self.tracks) - self.holes))
+        if self.index is not None or self.first_copies is not None or self.by_user is not None:
+            for index in range(start, len(self.tracks)):
+                self.track_added(index, self.tracks[index])
+
+    def track_added(self, index, track):
+        """Keep the lookups built so far up to date with a new track"""
+        if self.index is not None:
+            self.index.add(index, track.title)
+        if self.first_copies is not None:
+            self.add_copy(index, track)
+        if self.by_user is not None and track.added_by is not None:
+            self.by_user.setdefault(track.added_by, array('I')).append(index)
+
+    def add_copy(self, index, track):
+        key = track_key(track)
+        first = self.first_copies.setdefault(key, index)
+        if first == index:
+            return
+        copies = self.repeated.get(key)
+        if copies is None:
+            self.repeated[key] = array('I', (first, index))
+        else:
+            copies.append(index)
+
+    def play_order(self):
+        """The order array, created when tracks stop being in play order"""
+        if self.order is None:
+            self.order = array('I', range(len(self.tracks)))
+        return self.order
+
+    def play_positions(self):
+        """Index into tracks -> play position, holes are left at 0"""
+        if self.order is None:
+            return None
+        if self.positions is None:
+            self.positions = array('I', bytes(4 * len(self.tracks)))
+            for position, index in enumerate(self.order):
+                self.positions[index] = position
+        return self.positions
+
+    def remove(self, start, stop=None):
+        """Remove the tracks from play position start up to stop, returns them"""
+        stop = start + 1 if stop is None else stop
+        order = self.play_order()
+        removed = self.clear_slots(order[start:stop])
+        del order[start:stop]
+        self.forget(removed)
+        return removed
+
+    def remove_positions(self, positions):
+        """Remove the tracks at the given play positions (ascending), returns them"""
+        if not positions:
+            return []
+        order = self.play_order()
+        removed = self.clear_slots([order[position] for position in positions])
+        # Copy the runs between removed positions instead of filtering every entry
+        kept = order[:positions[0]]
+        for position, following in zip(positions, list(positions[1:]) + [len(order)]):
+            kept.extend(order[position + 1:following])
+        self.order = kept
+        self.forget(removed)
+        return removed
+
+    def clear_slots(self, indexes):
+        """Leave holes where tracks were removed, the lookups skip them until compaction"""
+        removed = []
+        for index in indexes:
+            removed.append(self.tracks[index])
+            self.tracks[index] = None
+        self.holes += len(removed)
+        return removed
+
+    def forget(self, removed):
+        self.total_duration -= sum(track.duration for track in removed)
+        self.positions = None
+        self.stored = None
+        self.persisted = 0
+        # Don't let holes pile up in a queue that keeps getting trimmed
+        if self.holes > len(self.order):
+            self.compact()
+
+    def compact(self):
+        """Drop the holes left by removals and put unshuffled tracks back in play order, renumbering the lookups"""
+        if self.order is None or (self.shuffled and not self.holes):
+            return
+        # Unshuffled, the play order is the new track order
+        live = sorted(self.order) if self.shuffled else self.order
+        new_indexes = array('I', [HOLE]) * len(self.tracks)
+        for new_index, index in enumerate(live):
+            new_indexes[index] = new_index
+        tracks = self.tracks
+        self.tracks[:] = [tracks[index] for index in live]
+        self.order = array('I', map(new_indexes.__getitem__, self.order)) if self.shuffled else None
+
+        if self.index is not None:
+            self.index.renumber(new_indexes)
+        if self.by_user is not None:
+            by_user = {}
+            for user_id, indexes in self.by_user.items():
+                indexes = renumber(indexes, new_indexes)
+                if indexes:
+                    by_user[user_id] = indexes
+            self.by_user = by_user
+        if self.first_copies is not None:
+            self.renumber_copies(new_indexes)
+
+        # Stored rows skip holes already, so they stay valid
+        self.holes = 0
+        self.positions = None
+        self.stored = None
+
+    def renumber_copies(self, new_indexes):
+        first_copies = {}
+        for key, index in self.first_copies.items():
+            index = new_indexes[index]
+            if index != HOLE:
+                first_copies[key] = index
+        repeated = {}
+        for key, indexes in self.repeated.items():
+            indexes = renumber(indexes, new_indexes)
+            if not indexes:
+                continue
+            first_copies.setdefault(key, indexes[0])
+            if len(indexes) > 1:
+                repeated[key] = indexes
+        self.first_copies = first_copies
+        self.repeated = repeated
+
+    def move(self, source, destination):
+        """Move the track at play position source to destination"""
+        order = self.play_order()
+        order.insert(destination, order.pop(source))
+        self.positions = None
+        if self.stored is not None:
+            self.stored.insert(destination, self.stored.pop(source))
+        if not self.shuffled:
+            self.persisted = 0  # Unshuffled queues are stored in play order
+
+    def stored_tracks(self, start=0):
+        """Tracks as the player store numbers them, from start on, without compacting"""
+        tracks = self.tracks
+        if self.order is None:
+            return tracks[start:]
+        if not self.shuffled:
+            return [tracks[index] for index in self.order[start:]]
+        if start:
+            # Holes only change when everything is rewritten, so they all lie before the stored tail
+            return tracks[start + self.holes:]
+        return [track for track in tracks if track is not None]
+
+    def stored_order(self):
+        """Shuffle order over stored_tracks(), None when unshuffled"""
+        if not self.shuffled:
+            return None
+        if not self.holes:
+            return self.order
+        if self.stored is None:
+            new_indexes = array('I', [HOLE]) * len(self.tracks)
+            for new_index, index in enumerate(sorted(self.order)):
+                new_indexes[index] = new_index
+            self.stored = array('I', map(new_indexes.__getitem__, self.order))
+        return self.stored
+
+    def duplicates(self):
+        """Play positions of tracks already queued at an earlier position"""
+        if self.first_copies is None:
+            self.first_copies = {}
+            self.repeated = {}
+            for index, track in enumerate(self.tracks):
+                if track is not None:
+                    self.add_copy(index, track)
+
+        # Only songs queued more than once are looked at
+        tracks = self.tracks
+        positions = self.play_positions()
+        duplicates = []
+        for indexes in self.repeated.values():
+            copies = [index for index in indexes if tracks[index] is not None]
+            if len(copies) < 2:
+                continue
+            if positions is not None:
+                copies = [positions[index] for index in copies]
+            copies.sort()
+            duplicates.extend(copies[1:])
+        duplicates.sort()
+        return duplicates
+
+    def queued_by(self, user_id):
+        """Play positions of tracks queued by a user"""
+        if self.by_user is None:
+            self.by_user = {}
+            for index, track in enumerate(self.tracks):
+                if track is not None and track.added_by is not None:
+                    self.by_user.setdefault(track.added_by, array('I')).append(index)
+
+        tracks = self.tracks
+        indexes = [index for index in self.by_user.get(user_id, ()) if tracks[index] is not None]
+        positions = self.play_positions()
+        if positions is None:
+            return indexes
+        return sorted(positions[index] for index in indexes)
+
+    def shuffle(self, keep=None):
+        """Shuffle the play order, leaving the track at position keep where it is"""
+        if not self.shuffled:
+            # Unshuffling goes back to this order, so it has to be the track order
+            self.compact()
+            self.shuffled = True
+        order = self.play_order()
+
+        self.positions = None
+        self.stored = None
+        kept = order[keep] if keep is not None and 0 <= keep < len(order) else None
+        random.shuffle(order)
+        if kept is not None:
+            moved_to = order.index(kept)
+            order[keep], order[moved_to] = order[moved_to], order[keep]
+
+    def unshuffle(self, position=None):
+        """Go back to the order tracks were added in, returns the new position of the track at position"""
+        if not self.shuffled:
+            return position
+        self.compact()
+        order, self.order = self.order, None
+        self.shuffled = False
+        self.stored = None
+        self.positions = None
+        if position is None or not 0 <= position < len(order):
+            return position
+        return order[position]
+
+    def search(self, query, limit=25):
+        """Play positions of tracks whose title matches query, in play order"""
+        terms = query_terms(query)
+        if not terms or not len(self):
+            return []
+        if self.index is None:
+            self.index = TitleIndex(self.tracks)
+
+        # A common prefix matches much of the queue, so reading titles in play order finds the first few before the index could union them
+        share = 1
+        for term in terms:
+            share *= min(self.index.match_count(term) / len(self.tracks), 1)
+        if share and limit <= share * SEARCH_SCAN / 2:
+            positions = []
+            for position, track in enumerate(itertools.islice(self, SEARCH_SCAN)):
+                if title_matches(track.title, terms):
+                    positions.append(position)
+                    if len(positions) == limit:
+                        return positions
+            if len(self) <= SEARCH_SCAN:
+                return positions
+
+        matches = self.index.search(terms)
+        # Only the first few of thousands of matches are needed
+        if self.order is None:
+            return heapq.nsmallest(limit, matches)
+
+        positions = self.play_positions()
+        tracks = self.tracks
+        return heapq.nsmallest(limit, (positions[index] for index in matches if tracks[index] is not None))